@@ -1,207 +1,121 @@
-import arcade
-import datetime
-
-# Constants for screen
-SCREEN_WIDTH = 1248
-SCREEN_HEIGHT = 720
-SCREEN_TITLE = "Jump It"
-
-# Constants used to scale sprites
-TILE_SCALING = 1
-CHARACTER_SCALING = TILE_SCALING
-SPRITE_PIXEL_SIZE = 128
-GRID_PIXEL_SIZE = SPRITE_PIXEL_SIZE * TILE_SCALING
-
-# Movement speeds for player, movement and jump speed are in pixels per frame
-PLAYER_MOVEMENT_SPEED = 10
-GRAVITY = 1.4
-PLAYER_JUMP_SPEED = 25
-
-# Constants for player spawn point
-PLAYER_START_X = 2
-PLAYER_START_Y = 1
-
-# Constants used to track if the player is facing left or right
-RIGHT_FACING = 0
-LEFT_FACING = 1
-
-# Constants for layer names within MapFinal.JSON
-LAYER_NAME_PLATFORMS = "Platforms"
-LAYER_NAME_BACKGROUND = "Background"
-LAYER_NAME_PLAYER = "Player"
-LAYER_NAME_SPIKE = "Spike"
-LAYER_NAME_DUCK = "Duck"
-
-# Loads a pair of textures, one for right-facing and the other for left-facing
-def load_texture_pair(filename):
-    return [arcade.load_texture(filename), arcade.load_texture(filename, flipped_horizontally=True)]
-
-# Sorts the score strings in format "score  |  date"
-def sort(strList):
-    for i in range(len(strList)):
-        tempList = strList[i].split("\t")
-        bigNum = int(tempList[0])
-        bigIndex = i
-        for j in range(i+1, len(strList)):
-            currentList = strList[j].split("\t")
-            currNum = int(currentList[0])
-            if currNum > bigNum:
-                bigNum = currNum
-                bigIndex = j
-        temp = strList[i]
-        strList[i] = strList[bigIndex]
-        strList[bigIndex] = temp
-
-# Takes in the new score, outputs the string containing the top ten scores and the new score
-def high_score(newScore):
-    # Reads in the existing scores
-    fin = open("assets/HighScores.txt", "r+")
-    scores = []
-    readIn = fin.readline()
-    while readIn != '':
-        scores.append(readIn)
-        readIn = fin.readline()
-
-    # Creates the string for the new score in the correct format
-    now = datetime.date.today()
-    number = str(newScore)
-    bigNum = False
-    if len(number) < 4:
-        a = number + "\t\t|\t" + str(now) + "\n"
-    else:
-        a = number + "\t|\t" + str(now) + "\n"
-        bigNum = True
-    scores.append(a)
-
-    # Sorts the strings to include the new one
-    sort(scores)
-
-    # Return pointer to beginning of file
-    fin.seek(0,0)
-
-    # Write in newly sorted scores to the file
-    for score in scores:
-        fin.write(str(score))
-    fin.close()
-
-    # Return the string the game needs to display
-    return top_ten(scores, a, bigNum)
-
-# Helper method for high_score() that generates the string in the correct format
-def top_ten(strList, a, bigNum):
-    returnStr = "Score\t|\t\tDate\n"
-    returnStr += "----------------------------------\n"
-    num = 10
-    found = False
-
-    # If there are not 10 scores yet, only use the number that there are
-    if len(strList) < 10:
-        num = len(strList)
-    for i in range(num):
-
-        # Places astericks around the new score for visibility, only on first instance in case of duplicate scores on the same date
-        if strList[i] == a and not found:
-            
-            # For new score that is 4 or more characters (including negative sign)
-            if bigNum:
-                newString = newString.replace("\n", "")
-                returnStr += "**" + newString + "**\n"
-                found = True
-            
-            # For new score that is 3 or less characters (including negative sign)
-            else:
-                newString = strList[i].replace("\t", "", 1)
-                newString = newString.replace("\n", "")
-                returnStr += "**" + newString + "**\n"
-                found = True
-        else:
-            returnStr += strList[i]
-   
-    # if the new score is not in top ten, place it below the list with an empty line
-    if not found:
-        returnStr += "\n" + a
-    return returnStr
-
-
-class Entity(arcade.Sprite):
-    def __init__(self, name_folder, name_file):
-        super().__init__()
-
-        # Default to facing right
-        self.facing_direction = RIGHT_FACING
-
-        # Load textures
-        self.idle_texture_pair = load_texture_pair("assets/Base_Model.png")
-        self.jump_texture_pair = load_texture_pair("assets/Jump.png")
-        self.walk_textures = load_texture_pair("assets/Walk.png")
-
-        # Set the initial texture
-        self.texture = self.idle_texture_pair[0]
-
-        # Set hit box
-        self.set_hit_box(self.texture.hit_box_points)
-
-
-class PlayerCharacter(Entity):
-    def __init__(self):
-
-        # Set up parent class
-        super().__init__("assets", "Base_Model.png")
-
-        # Track if jumping
-        self.jumping = False
-
-    def update_animation(self, delta_time: float = 1 / 60):
-        # Check if need to face right or left
-        if self.change_x < 0 and self.facing_direction == RIGHT_FACING:
-            self.facing_direction = LEFT_FACING
-        elif self.change_x > 0 and self.facing_direction == LEFT_FACING:
-            self.facing_direction = RIGHT_FACING
-
-        # Jumping
-        if self.change_y > 0 or self.change_y < 0:
-            self.texture = self.jump_texture_pair[self.facing_direction]
-            return
+import time
 
-        # Idle
-        if self.change_x == 0:
-            self.texture = self.idle_texture_pair[self.facing_direction]
-            return
+# When the game started loading, startup times are measured from here
+PROCESS_START = time.perf_counter()
 
-        # Walking
-        self.texture = self.walk_textures[self.facing_direction]
+import arcade
 
+from jumpit.audio import Mixer
+from jumpit.constants import SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, RENDER_RATE, RECORD_REPLAYS, REPLAY_FOLDER
+from jumpit.constants import RECORD_TELEMETRY, TELEMETRY_FOLDER
+from jumpit.constants import GHOST_COUNT, MAP_NAME, PROFILE_ON_START, PROFILE_OVERLAY_INTERVAL
+from jumpit.entities import ENTITY_IMAGES
+from jumpit.ghosts import load_race
+from jumpit.hud import Hud, LoadingText
+from jumpit.inputs import InputState
+from jumpit.levels import LevelManager, read_manifest
+from jumpit.loader import AssetLoader, FIRST_FRAME, INTERACTIVE
+from jumpit.profiler import FrameProfiler
+from jumpit.replay import ReplayRecorder, new_replay_path
+from jumpit.scores import ScoreWriter
+from jumpit.simulation import Simulation, EVENT_JUMP, EVENT_SPIKE, EVENT_WIN, EVENT_RESET
+from jumpit.telemetry import TelemetryWriter, NULL_TELEMETRY, KIND_SPIKE, KIND_WIN, KIND_RESET, KIND_INSTRUCTIONS, new_telemetry_path
+from jumpit.static_layers import StaticLayers
+from jumpit.streaming import read_level
+from jumpit.textures import TEXTURES
+from jumpit.timestep import FixedTimestep, lerp_point
+
+# Names of the assets the loader reads, the sounds are named by their paths
+LEVEL_ASSET = "level"
+TEXTURE_ASSET = "textures"
+GHOST_ASSET = "ghosts"
+JUMP_SOUND = ":resources:sounds/jump1.wav"
+GAME_OVER_SOUND = ":resources:sounds/gameover1.wav"
+WIN_SOUND = ":resources:sounds/upgrade1.wav"
+
+# Ghosts are loaded for each level the first time it is played, named by the level's map
+def ghost_asset(map_name):
+    return f"{GHOST_ASSET} {map_name}"
+
+# Copies of each sound that can play at once and the shortest time in seconds between two starts of it
+SOUND_LIMITS = {
+    JUMP_SOUND: (3, 0.05),
+    GAME_OVER_SOUND: (2, 0.1),
+    WIN_SOUND: (1, 0.5),
+}
+
+# Starts reading everything the game needs in the background, before the window has even opened.
+# The game starts once the level, the player's textures and the jump sound are in, the other sounds and the ghosts can come in later.
+# The ghosts are the best runs saved in ghost_folder, None leaves them out.
+def start_loading(map_name=MAP_NAME, ghost_folder=REPLAY_FOLDER):
+    loader = AssetLoader(start=PROCESS_START)
+    loader.load(LEVEL_ASSET, read_level, map_name)
+    loader.load(TEXTURE_ASSET, TEXTURES.preload, ENTITY_IMAGES)
+    loader.load(JUMP_SOUND, arcade.load_sound, JUMP_SOUND)
+    loader.load(GAME_OVER_SOUND, arcade.load_sound, GAME_OVER_SOUND, critical=False)
+    loader.load(WIN_SOUND, arcade.load_sound, WIN_SOUND, critical=False)
+    if ghost_folder is not None:
+        loader.load(ghost_asset(map_name), load_race, ghost_folder, map_name, GHOST_COUNT, critical=False)
+    return loader
 
 class JumpIt(arcade.Window):
-    def __init__(self):
+    def __init__(self, loader=None, ghost_folder=REPLAY_FOLDER):
+        # Start loading straight away if main() hasn't already, the window takes a while to open
+        loader = loader or start_loading()
+
         # Call the parent class to set up the window
-        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, update_rate=1 / RENDER_RATE)
+
+        # Initialize the loader, the loading screen is drawn until the game has what it needs to start
+        self.loader = loader
+        self.loading_text = LoadingText()
+        self.started = False
 
-        # Initialize the current state of which keys are pressed
+        # Tick the current run started on and how many runs came before it, a run lasts until R is pressed.
+        # The ghosts are shown as far into their runs as the player is into this one
+        self.run_start = 0
+        self.run_number = 0
+
+        # Initialize the mixer, sounds are played once a frame from players made once per sound
+        self.mixer = Mixer()
+
+        # Initialize the current state of which keys are held down, the simulation works out presses and releases
         self.left_pressed = False
         self.right_pressed = False
         self.up_pressed = False
-        self.jump_needs_reset = False
         self.reset_pressed = False
-        self.instruct_pressed = False
 
         # Initialize instruction state
         self.instructOn = False
 
-        # Initialize tile mao
-        self.tile_map = None
+        # Initialize the profiler, F3 shows the timing overlay and F4 writes a trace file
+        self.profiler = FrameProfiler(PROFILE_ON_START)
+        self.profile_refresh = 0.0
+
+        # Initialize the simulation that runs the game rules
+        self.sim = Simulation(profiler=self.profiler)
+
+        # Initialize the levels of the manifest, N moves on to the next one after the duck is collected.
+        # The next level is built while this one is played and recently played ones are kept built
+        self.levels = LevelManager(read_manifest())
+        self.level_index = self.levels.index(self.sim.map_name)
+
+        # Initialize where the ghosts of each level are loaded from, None leaves them out
+        self.ghost_folder = ghost_folder
 
-         # Initialize scene
-        self.scene = None
+        # Initialize the fixed timestep, and where the player was before the last tick so drawing can blend between the two
+        self.timestep = FixedTimestep()
+        self.previous_position = None
 
-        # Initialize player sprite
-        self.player_sprite = None
+        # Initialize the recording of the keys held on every tick
+        self.recorder = ReplayRecorder(self.sim.map_name, round(1 / self.timestep.step_time))
 
-        # Initialize physics engine
-        self.physics_engine = None
+        # Initialize the telemetry, where spikes were hit and when, saved in blocks in the background
+        self.telemetry = TelemetryWriter(new_telemetry_path(TELEMETRY_FOLDER, self.sim.map_name), self.sim.map_name) if RECORD_TELEMETRY else NULL_TELEMETRY
 
-         # Initialize score
-        self.score = 1000
+        # Initialize the score history, scores are saved in the background
+        self.score_writer = ScoreWriter()
+        self.pending_score = None
 
         # Initialize screen text
         self.win_text = ""
@@ -210,46 +124,84 @@ class JumpIt(arcade.Window):
         self.instruct_header_text = ""
         self.instruct_body_text = ""
 
-        # Load sounds
-        self.jump_sound = arcade.load_sound(":resources:sounds/jump1.wav")
-        self.game_over = arcade.load_sound(":resources:sounds/gameover1.wav")
-        self.win = arcade.load_sound(":resources:sounds/upgrade1.wav")
+        # Initialize the text objects that draw the screen text
+        self.hud = Hud()
+
+        # Initialize the baked background and platforms, each chunk is baked on the first frame it is in play
+        self.static_layers = StaticLayers()
+
+        # Initialize the cameras, the level scrolls with the player and the text stays put on the screen
+        self.camera = arcade.Camera(SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.gui_camera = arcade.Camera(SCREEN_WIDTH, SCREEN_HEIGHT)
 
 
     def setup(self):
-        # TileMap name
-        map_name = "assets/MapFinal5.JSON"
-
-        # Layer Options for the Tilemap, using true for every object that doesn't move
-        layer_options = {
-            LAYER_NAME_PLATFORMS: {
-                "use_spatial_hash": True,
-            },
-            LAYER_NAME_SPIKE: {
-                "use_spatial_hash": True,
-            },
-            LAYER_NAME_DUCK: {
-                "use_spatial_hash": True,
-            },
-        }
-
-        # Loading in TileMap and setting as scene
-        self.tile_map = arcade.load_tilemap(map_name, TILE_SCALING, layer_options, None, "Simple", 4.5, (-48,0))
-        self.scene = arcade.Scene.from_tilemap(self.tile_map)
-
-        # Set up the player and placing it at spawn point
-        self.player_sprite = PlayerCharacter()
-        self.player_sprite.center_x = (self.tile_map.tile_width * TILE_SCALING * PLAYER_START_X)
-        self.player_sprite.center_y = (self.tile_map.tile_height * TILE_SCALING * PLAYER_START_Y)
-        self.scene.add_sprite(LAYER_NAME_PLAYER, self.player_sprite)
-
-
-        # Creating the physics engine
-        self.physics_engine = arcade.PhysicsEnginePlatformer(
-            self.player_sprite,
-            gravity_constant=GRAVITY,
-            walls=self.scene[LAYER_NAME_PLATFORMS]
-        )
+        # Load the level into the simulation from the cache the loader read, waiting for it if it isn't in yet
+        self.sim.enter(self.levels.get(self.level_index, self.loader.get(LEVEL_ASSET)))
+        self.levels.preload(self.levels.next_index(self.level_index))
+        self.previous_position = self.sim.player_sprite.position
+        self.clear_text()
+        self.run_start = self.sim.tick_count
+        self.started = True
+        self.loader.mark(INTERACTIVE)
+
+    # Ticks played in the current run, counted the same way as Simulation.tick_count after new_game()
+    def run_tick(self):
+        return self.sim.tick_count - self.run_start
+
+    # Moves on to the next level of the manifest, it was built in the background while this one was played.
+    # Each level is saved as a replay and telemetry of its own, so both keep to one map
+    def next_level(self):
+        start = time.perf_counter()
+        self.save_replay()
+        self.telemetry.close()
+        self.level_index = self.levels.next_index(self.level_index)
+        self.sim.switch_level(self.levels.get(self.level_index))
+        self.levels.preload(self.levels.next_index(self.level_index))
+        self.recorder = ReplayRecorder(self.sim.map_name, self.recorder.replay.rate)
+        self.telemetry = TelemetryWriter(new_telemetry_path(TELEMETRY_FOLDER, self.sim.map_name), self.sim.map_name) if RECORD_TELEMETRY else NULL_TELEMETRY
+
+        # Ghosts of a level played for the first time are loaded in the background, the level starts without waiting for them
+        name = ghost_asset(self.sim.map_name)
+        if self.ghost_folder is not None and name not in self.loader:
+            self.loader.load(name, load_race, self.ghost_folder, self.sim.map_name, GHOST_COUNT, critical=False)
+
+        self.previous_position = self.sim.player_sprite.position
+        self.clear_text()
+        self.run_start = self.sim.tick_count
+        self.run_number = 0
+        print(f"Switched to {self.levels.levels[self.level_index].name} in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def save_replay(self):
+        if RECORD_REPLAYS and self.recorder.replay.runs:
+            self.recorder.replay.save(new_replay_path(REPLAY_FOLDER, self.recorder.replay.map_name))
+
+    def play_sound(self, name):
+        # Sounds still loading are skipped, only the jump sound is certain to be in once the game starts
+        if name not in self.mixer:
+            sound = self.loader.result(name)
+            if sound is None:
+                return
+            self.mixer.add(name, sound, *SOUND_LIMITS[name])
+        self.mixer.play(name)
+
+    def on_close(self):
+        # Stop loading anything that isn't in yet
+        self.loader.close()
+        self.levels.close()
+        self.mixer.close()
+
+        # Make sure the last score and telemetry made it to disk before exiting
+        self.score_writer.close()
+        self.telemetry.close()
+
+        # Save the session so it can be played back
+        self.save_replay()
+        super().on_close()
+
+    def clear_text(self):
+        # A leaderboard still being saved belongs to the last game, so it isn't shown
+        self.pending_score = None
 
         # Resetting the end screen text for if restart is used
         self.win_text = ""
@@ -258,16 +210,6 @@ class JumpIt(arcade.Window):
         self.instruct_header_text = ""
         self.instruct_body_text = ""
 
-    def restart(self):
-        # Reseting player locaton to spawn point, resetting x and y speed to 0, and turning off key presses so you don't keep moving on respawn until you release and press again
-        self.player_sprite.change_x = 0
-        self.player_sprite.change_y = 0
-        self.jump_needs_reset = False
-        self.right_pressed = False
-        self.left_pressed = False
-        self.player_sprite.center_x = (self.tile_map.tile_width * TILE_SCALING * PLAYER_START_X)
-        self.player_sprite.center_y = (self.tile_map.tile_height * TILE_SCALING * PLAYER_START_Y)
-
     def changeInstructState(self):
         if self.instructOn:
             self.instruct_header_text = ""
@@ -282,6 +224,7 @@ class JumpIt(arcade.Window):
         instructString += "- Use 'A' and 'D' or the left/right arrow keys to move\n"
         instructString += "- Press 'W' or the up arrow key to jump\n"
         instructString += "- Press 'R' to reset the spikes and score\n"
+        instructString += "- Press 'N' after collecting the duck to go on to the next level\n"
         instructString += "- Press 'I' again to close these instructions\n"
         self.instruct_body_text = instructString
         self.instructOn = True
@@ -291,57 +234,50 @@ class JumpIt(arcade.Window):
         # Clear the screen
         self.clear()
 
-        # Draw the Scene
-        self.scene.draw()
-
-        # Drawing text elements onto the screen, all but first two will be invisible upon game start
-        score_text = f"Score: {self.score}"
-        arcade.draw_text(score_text, 10, 10, arcade.csscolor.BLACK, 25)
-
-        arcade.draw_text("Press 'I' for instructions", 10, SCREEN_HEIGHT - 25, arcade.csscolor.BLACK, 15)
-
-        win_ = f"{self.win_text}"
-        arcade.draw_text(win_, 0, SCREEN_HEIGHT*0.78, arcade.csscolor.BLACK, 100, SCREEN_WIDTH, align="center")
-
-        hiScore = f"{self.high_score_text}"
-        arcade.draw_text(hiScore, SCREEN_WIDTH*0.38, SCREEN_HEIGHT*0.70, arcade.csscolor.BLACK, 18, SCREEN_WIDTH, align="left", bold=True, multiline= True)
-
-        to_reset = f"{self.reset_text}"
-        arcade.draw_text(to_reset, 0, 50, arcade.csscolor.BLACK, 50, SCREEN_WIDTH, align="center")
+        # Show how far loading has got until the game starts
+        if not self.started:
+            self.loading_text.update(*self.loader.progress())
+            self.loading_text.draw()
+            self.loader.mark(FIRST_FRAME)
+            return
 
-        instruct_header = f"{self.instruct_header_text}"
-        arcade.draw_text(instruct_header, 0, SCREEN_HEIGHT*0.67, arcade.csscolor.BLACK, 60, SCREEN_WIDTH, align="center")
+        # Draw the player part way between its last two ticks, then put it back where the simulation left it
+        player = self.sim.player_sprite
+        position = player.position
+        player.position = lerp_point(self.previous_position, position, self.timestep.alpha)
 
-        instruct_body = f"{self.instruct_body_text}"
-        arcade.draw_text(instruct_body, SCREEN_WIDTH*0.2, SCREEN_HEIGHT*0.60, arcade.csscolor.BLACK, 20, SCREEN_WIDTH, align="left", multiline= True)
+        # Draw the Scene around the player, the background and platforms are one baked texture per chunk
+        with self.profiler.phase("draw scene"):
+            self.scroll_to(player.center_x)
+            self.camera.use()
+            self.static_layers.draw(self.sim.stream, self.background_color)
+        player.position = position
 
+        # Draw the best saved runs racing the player once they are loaded, all from one sprite list
+        ghosts = self.loader.result(ghost_asset(self.sim.map_name))
+        if ghosts is not None:
+            with self.profiler.phase("draw ghosts"):
+                ghosts.draw(self.run_tick() - 1)
 
-    def process_keychange(self):
-        # Process up
-        if self.up_pressed:
-            if (self.physics_engine.can_jump(y_distance=10) and not self.jump_needs_reset):
-                self.player_sprite.change_y = PLAYER_JUMP_SPEED
-                self.jump_needs_reset = True
-                arcade.play_sound(self.jump_sound)
+        # Drawing text elements onto the screen, all but first two will be invisible upon game start
+        with self.profiler.phase("draw text"):
+            self.gui_camera.use()
+            self.hud.update(self.sim.score, self.win_text, self.high_score_text, self.reset_text, self.instruct_header_text, self.instruct_body_text)
+            self.hud.draw()
+        self.loader.mark(FIRST_FRAME)
 
-        # Process left/right
-        if self.right_pressed and not self.left_pressed:
-            self.player_sprite.change_x = PLAYER_MOVEMENT_SPEED
-        elif self.left_pressed and not self.right_pressed:
-            self.player_sprite.change_x = -PLAYER_MOVEMENT_SPEED
-        else:
-            self.player_sprite.change_x = 0
 
-        #Process reset
-        if self.reset_pressed:
-            self.player_sprite.change_x = 0
-            self.player_sprite.change_y = 0
+    # Keeps the player in the middle of the screen, stopping at the edges of the level.
+    # The first and last columns of a map are its outer walls and sit just off screen, the way MAP_OFFSET hides the left one.
+    def scroll_to(self, x):
+        stream = self.sim.stream
+        left = stream.left + stream.tile_width
+        right = max(left, stream.right - stream.tile_width - SCREEN_WIDTH)
+        self.camera.move_to((round(min(max(x - SCREEN_WIDTH / 2, left), right)), 0))
 
-        # Process instructions
-        if self.instruct_pressed:
-            self.changeInstructState()
+    def current_input(self):
+        return InputState(self.left_pressed, self.right_pressed, self.up_pressed, self.reset_pressed)
 
-        
     def on_key_press(self, key, modifiers):
         # Check if up
         if key == arcade.key.UP or key == arcade.key.W:
@@ -354,29 +290,35 @@ class JumpIt(arcade.Window):
         # Check if right
         elif key == arcade.key.RIGHT or key == arcade.key.D:
             self.right_pressed = True
-        
+
         # Check if r
         elif key == arcade.key.R:
             self.reset_pressed = True
-            self.jump_needs_reset = False
-            self.right_pressed = False
-            self.left_pressed = False
-            self.score = 1000
-            self.setup()
+
+        # Check if n, moves on to the next level once the duck is collected
+        elif key == arcade.key.N:
+            if self.sim.won and len(self.levels.levels) > 1:
+                self.next_level()
 
         # Check if i
         elif key == arcade.key.I:
-            self.instruct_pressed = True
+            self.changeInstructState()
+            self.telemetry.record(KIND_INSTRUCTIONS, self.run_number, self.run_tick())
+
+        # Check if F3, turns profiling and its overlay on or off
+        elif key == arcade.key.F3:
+            self.profiler.toggle()
+            self.hud.profile.set("")
 
-        # Once you know the new key, process it
-        self.process_keychange()
+        # Check if F4, writes the timings kept so far to a trace file
+        elif key == arcade.key.F4:
+            self.profiler.dump_trace(time.strftime("profile-%Y%m%d-%H%M%S.json"))
 
     def on_key_release(self, key, modifiers):
         # Check if up
         if key == arcade.key.UP or key == arcade.key.W:
             self.up_pressed = False
-            self.jump_needs_reset = False
-        
+
         # Check if left
         elif key == arcade.key.LEFT or key == arcade.key.A:
             self.left_pressed = False
@@ -389,67 +331,74 @@ class JumpIt(arcade.Window):
         elif key == arcade.key.R:
             self.reset_pressed = False
 
-        # Check if i
-        elif key == arcade.key.I:
-            self.instruct_pressed = False
-        
-        # Once you know the missing key, process it
-        self.process_keychange()
-
 
     def on_update(self, delta_time):
-        # Move the player with the physics engine
-        self.physics_engine.update()
-
-        # Update animations and jump state
-        if self.physics_engine.can_jump():
-            self.player_sprite.can_jump = False
-        else:
-            self.player_sprite.can_jump = True
-
-        # Update animations for each layer in the TileMap
-        self.scene.update_animation(
-            delta_time,
-            [
-                LAYER_NAME_SPIKE,
-                LAYER_NAME_DUCK,
-                LAYER_NAME_BACKGROUND,
-                LAYER_NAME_PLAYER,
-            ],
-        )
-
-        # Making a list of all collisions player is currently touching
-        player_collision_list = arcade.check_for_collision_with_lists(
-            self.player_sprite,
-            [
-                self.scene[LAYER_NAME_SPIKE],
-                self.scene[LAYER_NAME_DUCK],
-            ],
-        )
-
-        # Processing each collision, displaying end screen if duck, removing spike otherwise
-        for collision in player_collision_list:
-            if self.scene[LAYER_NAME_DUCK] in collision.sprite_lists:
-                arcade.play_sound(self.win)
-                top_tenStr = high_score(self.score)
+        # Start the game as soon as everything it needs is loaded
+        if not self.started:
+            if self.loader.ready():
+                self.setup()
+                print(self.loader.report())
+            return
+
+        # Run as many fixed ticks as the time since the last frame adds up to
+        for _ in range(self.timestep.advance(delta_time)):
+            self.step()
+
+        # Start the sounds the ticks asked for
+        self.mixer.update()
+
+        # Show the leaderboard once the score has been saved
+        with self.profiler.phase("score io"):
+            for ticket, top_tenStr in self.score_writer.poll():
+                if ticket == self.pending_score:
+                    self.high_score_text = top_tenStr
+                    self.pending_score = None
+
+        # Refresh the timing overlay every so often, laying the text out every frame would skew the timings
+        if self.profiler.enabled:
+            self.profile_refresh -= delta_time
+            if self.profile_refresh <= 0:
+                self.profile_refresh = PROFILE_OVERLAY_INTERVAL
+                self.hud.profile.set(self.profiler.summary())
+
+    def step(self):
+        # Step the game rules with the keys currently held down
+        self.previous_position = self.sim.player_sprite.position
+        inputs = self.current_input()
+        self.recorder.record(inputs)
+        events = self.sim.step(inputs, self.timestep.step_time)
+
+        # Play sounds and show text for anything that happened during the tick
+        for event, data in events:
+            if event == EVENT_JUMP:
+                self.play_sound(JUMP_SOUND)
+            elif event == EVENT_SPIKE:
+                self.play_sound(GAME_OVER_SOUND)
+                self.previous_position = self.sim.player_sprite.position
+                self.telemetry.record(KIND_SPIKE, self.run_number, self.run_tick(), *data)
+            elif event == EVENT_RESET:
+                self.clear_text()
+                self.previous_position = self.sim.player_sprite.position
+                self.telemetry.record(KIND_RESET, self.run_number, self.run_tick())
+                # R is handled at the start of a tick, so this tick is the first of the next run
+                self.run_start = self.sim.tick_count - 1
+                self.run_number += 1
+            elif event == EVENT_WIN:
+                self.play_sound(WIN_SOUND)
+                self.telemetry.record(KIND_WIN, self.run_number, self.run_tick(), *self.sim.player_sprite.position)
+                with self.profiler.phase("score io"):
+                    self.pending_score = self.score_writer.submit(data)
                 self.win_text = "You Win!"
-                self.high_score_text = top_tenStr
                 self.reset_text = "Press \"r\" to reset"
-                collision.remove_from_sprite_lists()
-                return
-            self.scene[LAYER_NAME_SPIKE] in collision.sprite_lists
-            arcade.play_sound(self.game_over)
-            self.score -= 50
-            collision.remove_from_sprite_lists()
-            self.restart()
+                if len(self.levels.levels) > 1:
+                    self.reset_text += " or \"n\" for the next level"
 
 # Start up function                
 def main():
-    window = JumpIt()
-    window.setup()
+    loader = start_loading()
+    window = JumpIt(loader)
     arcade.run()
 
 if __name__ == "__main__":
     main()
 
-
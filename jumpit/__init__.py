@@ -0,0 +1,2 @@
+# Game logic for Jump It that can be shared between the window, headless tools and the server.
+# Modules are kept separate so tools that only need scores or replays don't have to import arcade.
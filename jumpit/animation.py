@@ -0,0 +1,30 @@
+import arcade
+
+
+# Checks if a sprite does anything when animated, plain tiles use arcade.Sprite's empty update_animation
+def is_animated(sprite):
+    return type(sprite).update_animation is not arcade.Sprite.update_animation
+
+
+# Advances only the sprites that have an animation, such as the player or animated tiles.
+# Sprites are registered once when a level is set up, so a tick costs the same no matter how many static tiles a level has.
+# A registered sprite that isn't in any sprite list, like a spike that was hit, is skipped until it is put back.
+class AnimationScheduler:
+    def __init__(self):
+        # Used as an ordered set, sprites animate in the order they were registered
+        self.sprites = {}
+
+    def register(self, sprite):
+        if is_animated(sprite):
+            self.sprites[sprite] = None
+
+    def unregister(self, sprite):
+        self.sprites.pop(sprite, None)
+
+    def clear(self):
+        self.sprites.clear()
+
+    def update(self, delta_time):
+        for sprite in self.sprites:
+            if sprite.sprite_lists:
+                sprite.update_animation(delta_time)
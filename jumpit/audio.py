@@ -0,0 +1,87 @@
+import time
+
+# arcade picks the audio drivers pyglet tries before importing pyglet.media, so the players have to come from there
+from arcade.sound import media
+
+# Players for one sound, made once and played again from the start instead of making a new player for every copy
+class Effect:
+    def __init__(self, sound, voices, min_interval, volume):
+        self.sound = sound
+        self.min_interval = min_interval
+        self.players = []
+        self.ends = []
+        for _ in range(voices):
+            player = media.Player()
+            player.volume = volume
+            player.queue(sound.source)
+            # A player normally lets go of its sound and its audio buffers when the sound ends, these keep both to be played again
+            player.on_eos = lambda: None
+            self.players.append(player)
+            self.ends.append(0.0)
+
+        # When a copy last started, so rapid repeats can be dropped
+        self.last_start = -min_interval
+
+    # Starts a copy on a player that has finished, unless too many are playing or one started too recently
+    def play(self, requested):
+        if requested - self.last_start < self.min_interval:
+            return False
+        now = time.perf_counter()
+        for voice, end in enumerate(self.ends):
+            if end <= now:
+                player = self.players[voice]
+                if player.playing:
+                    player.seek(0.0)
+                else:
+                    player.play()
+                self.ends[voice] = now + self.sound.source.duration
+                self.last_start = requested
+                return True
+        return False
+
+    def delete(self):
+        for player in self.players:
+            player.pause()
+            player.delete()
+
+
+# Plays sound effects from a fixed pool of players per effect.
+# Players are only touched from the game loop, pyglet's clock they schedule on isn't safe to use from another thread.
+# Asking for a sound only notes it down, the sounds asked for during a frame are started together by update().
+# Each effect has a limit on how many copies play at once and a shortest time between two starts,
+# requests past either are dropped, so ten spikes hit on one tick play one sound instead of ten.
+class Mixer:
+    def __init__(self):
+        # Effects by name
+        self.effects = {}
+
+        # Sounds asked for since the last update, as (name, when)
+        self.pending = []
+
+        # Copies played and dropped, for checking the limits
+        self.played = 0
+        self.dropped = 0
+
+    def __contains__(self, name):
+        return name in self.effects
+
+    # Makes the players for an effect, voices is how many copies can play at once
+    def add(self, name, sound, voices=1, min_interval=0.0, volume=1.0):
+        self.effects[name] = Effect(sound, voices, min_interval, volume)
+
+    def play(self, name):
+        self.pending.append((name, time.perf_counter()))
+
+    # Starts the sounds asked for since the last update, called once a frame
+    def update(self):
+        pending, self.pending = self.pending, []
+        for name, requested in pending:
+            if name in self.effects and self.effects[name].play(requested):
+                self.played += 1
+            else:
+                self.dropped += 1
+
+    def close(self):
+        for effect in self.effects.values():
+            effect.delete()
+        self.effects = {}
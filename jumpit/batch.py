@@ -0,0 +1,172 @@
+import argparse
+import csv
+import importlib
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from jumpit.constants import MAP_NAME, SIMULATION_RATE
+from jumpit.inputs import InputState
+from jumpit.replay import Replay, ReplayResult, play
+from jumpit.telemetry import KIND_SPIKE, KIND_WIN, NULL_TELEMETRY, TelemetryWriter
+
+# Longest a policy run is played for before it counts as not finishing, two minutes of game time
+MAX_TICKS = SIMULATION_RATE * 120
+
+# Runs handed to a worker at a time, more than one per worker keeps the pool busy without much overhead
+CHUNKS_PER_WORKER = 4
+
+
+# Holds random keys, changing them every few ticks
+class RandomPolicy:
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.hold = 0
+        self.inputs = InputState()
+
+    def __call__(self, sim):
+        if self.hold == 0:
+            self.hold = self.rng.randint(4, 30)
+            self.inputs = InputState(self.rng.random() < 0.3, self.rng.random() < 0.7, self.rng.random() < 0.5)
+        self.hold -= 1
+        return self.inputs
+
+
+# Holds right and taps jump at random moments, a rough stand in for a player rushing the level
+class RunnerPolicy:
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.jump_ticks = 0
+
+    def __call__(self, sim):
+        if self.jump_ticks == 0 and self.rng.random() < 0.08:
+            self.jump_ticks = self.rng.randint(3, 25)
+        if self.jump_ticks:
+            self.jump_ticks -= 1
+        # A spike sends the player back with right let go, so right is released for a tick and then pressed again
+        if sim is not None and sim.last_input.right and not sim.right_pressed:
+            return InputState(up=self.jump_ticks > 0)
+        return InputState(right=True, up=self.jump_ticks > 0)
+
+
+POLICIES = {
+    "random": RandomPolicy,
+    "runner": RunnerPolicy,
+}
+
+
+# Finds a policy by name, or as module:Class for a policy that isn't built in.
+# A policy is created with a seed and called once per tick with the simulation, returning the keys to hold.
+def find_policy(name):
+    if name in POLICIES:
+        return POLICIES[name]
+    module_name, _, attribute = name.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+# Level each worker loaded, kept between runs and started over with new_game()
+worker_sim = None
+
+
+def start_worker(map_name):
+    global worker_sim
+    # Imported here so the parent process doesn't need arcade just to hand out runs
+    from jumpit.simulation import Simulation
+
+    worker_sim = Simulation(map_name)
+    worker_sim.setup()
+
+
+# Plays a policy until it reaches the duck or runs out of ticks
+def play_policy(sim, policy, max_ticks):
+    from jumpit.simulation import EVENT_SPIKE, EVENT_WIN
+
+    sim.new_game()
+    result = ReplayResult()
+    tick_time = 1 / SIMULATION_RATE
+    while sim.tick_count < max_ticks and not result.wins:
+        for event, data in sim.step(policy(sim), tick_time):
+            if event == EVENT_SPIKE:
+                result.spikes_hit += 1
+                result.deaths.append((sim.tick_count, data))
+            elif event == EVENT_WIN:
+                result.wins.append((sim.tick_count, data))
+    result.ticks = sim.tick_count
+    result.score = sim.score
+    return result
+
+
+# One run as (run number, policy name or replay path, seed), played on the worker's level
+def run_job(job):
+    number, source, seed, max_ticks = job
+    if source.endswith(".jir"):
+        result = play(Replay.load(source), worker_sim)
+    else:
+        result = play_policy(worker_sim, find_policy(source)(seed), max_ticks)
+    finish = result.wins[0][0] if result.wins else None
+    return number, source, seed, result.score, result.ticks, finish, result.spikes_hit, result.deaths
+
+
+def run_batch(jobs, map_name=MAP_NAME, workers=None):
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(1, len(jobs) // (workers * CHUNKS_PER_WORKER))
+    with multiprocessing.Pool(workers, initializer=start_worker, initargs=(map_name,)) as pool:
+        yield from pool.imap_unordered(run_job, jobs, chunksize=chunk_size)
+
+
+# Plays many runs across every core: python -m jumpit.batch --policy random --runs 10000
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play Jump It with bots or replays on every core and report how each run went.")
+    parser.add_argument("replays", nargs="*", help="replay files to play, each is one run")
+    parser.add_argument("--map", default=MAP_NAME, help="map to play the policies on")
+    parser.add_argument("--policy", action="append", default=[], help=f"policy to run, {', '.join(POLICIES)} or module:Class, can be given more than once")
+    parser.add_argument("--runs", type=int, default=100, help="runs per policy, each with its own seed")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first run")
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS, help="ticks a policy run gets to reach the duck")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use, one per core by default")
+    parser.add_argument("--output", default=None, help="CSV file for the results, printed if not given")
+    parser.add_argument("--telemetry", default=None, help="telemetry file for the spike hits and wins of every run, for python -m jumpit.heatmap")
+    args = parser.parse_args(argv)
+
+    for name in args.policy:
+        find_policy(name)
+
+    jobs = [(index, path, 0, 0) for index, path in enumerate(args.replays)]
+    for name in args.policy:
+        for seed in range(args.seed, args.seed + args.runs):
+            jobs.append((len(jobs), name, seed, args.max_ticks))
+    if not jobs:
+        parser.error("give replay files or at least one --policy")
+
+    fout = open(args.output, "w", newline="") if args.output else sys.stdout
+    writer = csv.writer(fout)
+    writer.writerow(["run", "source", "seed", "score", "ticks", "finish_tick", "spikes_hit", "deaths"])
+    telemetry = TelemetryWriter(args.telemetry, args.map) if args.telemetry else NULL_TELEMETRY
+
+    finished = 0
+    total_ticks = 0
+    start = time.perf_counter()
+    try:
+        for number, source, seed, score, ticks, finish, spikes_hit, deaths in run_batch(jobs, args.map, args.workers):
+            total_ticks += ticks
+            finished += finish is not None
+            death_text = " ".join(f"{tick}@{x:g},{y:g}" for tick, (x, y) in deaths)
+            writer.writerow([number, source, seed, score, ticks, "" if finish is None else finish, spikes_hit, death_text])
+            # Runs don't report where the player was at the duck, only when they got there
+            for tick, (x, y) in deaths:
+                telemetry.record(KIND_SPIKE, number, tick, x, y)
+            if finish is not None:
+                telemetry.record(KIND_WIN, number, finish)
+    finally:
+        if args.output:
+            fout.close()
+        telemetry.close()
+    elapsed = time.perf_counter() - start
+    print(f"{len(jobs)} runs, {finished} reached the duck, {total_ticks} ticks in {elapsed:.2f} s "
+          f"({len(jobs) / elapsed:.1f} runs/s, {total_ticks / elapsed:.0f} ticks/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
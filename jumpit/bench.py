@@ -0,0 +1,446 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+
+# Where results and the stored baseline live by default
+RESULTS_FILE = "bench_results.json"
+BASELINE_FILE = "benchmarks/baseline.json"
+
+# A benchmark counts as a regression when its median is this much slower than the baseline
+DEFAULT_TOLERANCE = 0.25
+
+# Leaderboard sizes the score benchmarks are run at
+SCORE_SIZES = [10, 10000, 1000000]
+
+# Sessions the server benchmark ticks at once
+SERVER_SESSIONS = [1, 100, 500]
+
+
+# Raised by the benchmarks that open a window when there is nothing to open it on
+class NoDisplay(Exception):
+    pass
+
+
+# Windows need an X display on Linux unless they are drawn headless with EGL
+def require_display():
+    if sys.platform.startswith("linux") and not os.environ.get("ARCADE_HEADLESS") and not os.environ.get("DISPLAY"):
+        raise NoDisplay("no display to open a window on, --headless draws with EGL instead")
+
+
+# Runs func number times per repeat and returns the time per call of every repeat in seconds
+def measure(func, number=1, repeats=5, setup=None):
+    times = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return times
+
+
+def scripted_inputs(ticks, seed=1):
+    from jumpit.inputs import InputState
+
+    rng = random.Random(seed)
+    inputs = []
+    current = InputState()
+    for tick in range(ticks):
+        if tick % 15 == 0:
+            current = InputState(rng.random() < 0.3, rng.random() < 0.6, rng.random() < 0.4, rng.random() < 0.003)
+        inputs.append(current)
+    return inputs
+
+
+def bench_setup(results):
+    from jumpit.simulation import Simulation
+
+    results["setup"] = measure(lambda: Simulation().setup(), repeats=7)
+
+
+def bench_setup_tilemap(results):
+    import arcade
+    from jumpit.constants import MAP_NAME, MAP_OFFSET, TILE_SCALING
+
+    results["setup_tilemap_json"] = measure(lambda: arcade.load_tilemap(MAP_NAME, TILE_SCALING, None, None, "Simple", 4.5, MAP_OFFSET), repeats=7)
+
+
+def bench_reset(results):
+    from jumpit.constants import LAYER_NAME_SPIKE
+    from jumpit.simulation import Simulation
+
+    sim = Simulation()
+    sim.setup()
+
+    # Take out half the spikes so there is something to put back
+    def remove_spikes():
+        for spike in list(sim.scene[LAYER_NAME_SPIKE])[::2]:
+            sim.remove_trigger(spike)
+
+    results["reset"] = measure(sim.reset, repeats=50, setup=remove_spikes)
+
+
+def bench_step(results):
+    from jumpit.simulation import Simulation
+
+    sim = Simulation()
+    sim.setup()
+    inputs = scripted_inputs(5000)
+
+    def run():
+        sim.new_game()
+        for tick_input in inputs:
+            sim.step(tick_input)
+
+    # Stored per tick, the whole run is 5000 ticks
+    results["step_5000_ticks"] = [value / len(inputs) for value in measure(run, repeats=3)]
+
+
+def bench_collision(results):
+    from jumpit.simulation import Simulation
+
+    sim = Simulation()
+    sim.setup()
+    rng = random.Random(2)
+    positions = [(rng.uniform(0, 1248), rng.uniform(0, 720)) for _ in range(1000)]
+    player = sim.player_sprite
+
+    def run():
+        for position in positions:
+            player.position = position
+            sim.triggers.hits(player)
+
+    results["collision_check"] = [value / len(positions) for value in measure(run, repeats=5)]
+
+
+def bench_scores(results):
+    from jumpit.scores import ScoreStore, format_row
+
+    rng = random.Random(3)
+    folder = tempfile.mkdtemp(prefix="jumpit-bench-")
+    try:
+        for size in SCORE_SIZES:
+            path = os.path.join(folder, f"scores-{size}.txt")
+            index_path = path + ".idx"
+            with open(path, "w") as fout:
+                for start in range(0, size, 100000):
+                    fout.write("".join(format_row(rng.randrange(-500, 1001, 50), "2023-10-13") for _ in range(min(100000, size - start))))
+
+            results[f"score_migrate_{size}"] = measure(lambda: ScoreStore(path, index_path), repeats=1, setup=lambda: os.path.exists(index_path) and os.remove(index_path))
+            store = ScoreStore(path, index_path)
+            results[f"high_score_{size}"] = measure(lambda: store.high_score(rng.randrange(-500, 1001, 50)), number=20, repeats=5)
+    finally:
+        shutil.rmtree(folder)
+
+
+# Time to switch to a level kept built by the level manager, and to build it from its cache the way a switch without one would
+def bench_levels(results):
+    from jumpit.levels import LevelManager, read_manifest
+    from jumpit.simulation import Simulation, build_playable
+    from jumpit.streaming import read_level
+
+    levels = LevelManager(read_manifest())
+    sim = Simulation()
+    sim.enter(levels.get(0))
+    levels.get(levels.next_index(0))
+    current = [0]
+
+    def switch():
+        current[0] = levels.next_index(current[0])
+        sim.switch_level(levels.get(current[0]))
+
+    results["level_switch"] = measure(switch, number=10, repeats=5)
+
+    info = levels.levels[levels.next_index(0)]
+    results["level_build"] = measure(lambda: build_playable(info.map_name, read_level(info.map_name), info.spawn).close(), repeats=5)
+    levels.close()
+
+
+# Stands in for a client connection in the server benchmark, everything sent is thrown away
+class NullConnection:
+    class transport:
+        @staticmethod
+        def get_write_buffer_size():
+            return 0
+
+    def write(self, data):
+        pass
+
+    def is_closing(self):
+        return False
+
+    def close(self):
+        pass
+
+
+# Time the server takes for one tick of every session, with each session's bot pressing keys as a player would.
+# Stored per session, so the sessions one core can run at the tick rate is SIMULATION_RATE times this, inverted
+def bench_server(results):
+    from jumpit.batch import RunnerPolicy
+    from jumpit.levels import read_manifest
+    from jumpit.scores import ScoreWriter
+    from jumpit.server import GameServer
+
+    folder = tempfile.mkdtemp(prefix="jumpit-bench-")
+    server = GameServer(read_manifest(), score_writer=ScoreWriter(os.path.join(folder, "scores.txt"), os.path.join(folder, "scores.idx")))
+    try:
+        for count in SERVER_SESSIONS:
+            while len(server.sessions) < count:
+                server.open_session(0, NullConnection())
+            sessions = list(server.sessions.values())
+            policies = [RunnerPolicy(number) for number in range(count)]
+
+            def tick():
+                for session, policy in zip(sessions, policies):
+                    server.receive_input(session, 0, policy(session.sim).to_bits())
+                server.tick()
+
+            for _ in range(30):
+                tick()
+            results[f"server_tick_{count}"] = [value / count for value in measure(tick, number=30, repeats=5)]
+    finally:
+        server.close()
+        shutil.rmtree(folder)
+
+
+# Time the game loop spends playing a sound, asked for and started through the mixer and by making a player the way arcade.play_sound does
+def bench_sound(results):
+    import arcade
+    from jumpit.audio import Mixer
+
+    sound = arcade.load_sound(":resources:sounds/jump1.wav")
+    mixer = Mixer()
+    mixer.add("jump", sound, 3, 0.05)
+    try:
+        results["sound_request"] = measure(lambda: (mixer.play("jump"), mixer.update()), number=200, repeats=5)
+        results["sound_new_player"] = measure(lambda: arcade.play_sound(sound), number=200, repeats=5)
+    finally:
+        mixer.close()
+
+
+def game_path():
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "JumpIt_1.2.py")
+
+
+# Loads the game window out of JumpIt_1.2.py, the file name isn't importable the normal way
+def load_game_module():
+    spec = importlib.util.spec_from_file_location("jumpit_game", game_path())
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Time the game loop spends moving and drawing ghosts, for one ghost and for many.
+# The GPU is left out, a software renderer spends most of its time blending the overlapping ghosts
+def measure_ghosts(results, window):
+    from jumpit.ghosts import FRAMES, GhostRace, GhostTrack
+
+    rng = random.Random(4)
+    tracks = []
+    for _ in range(500):
+        ticks = rng.randrange(200, 600)
+        xs = array("f", (100 + tick * 2 + rng.random() for tick in range(ticks)))
+        ys = array("f", (150 + rng.random() * 300 for tick in range(ticks)))
+        frames = array("B", (rng.randrange(len(FRAMES)) for tick in range(ticks)))
+        tracks.append(GhostTrack(1000, xs, ys, frames))
+
+    for count in (1, 500):
+        race = GhostRace(tracks[:count])
+        race.draw(0)
+        window.ctx.finish()
+        ticks = iter(range(1, 1000000))
+        results[f"ghosts_{count}"] = measure(lambda: race.draw(next(ticks)), number=100, repeats=5, setup=window.ctx.finish)
+
+
+def bench_draw(results):
+    require_display()
+    game = load_game_module()
+    # Without the saved ghosts, so the numbers don't depend on what is in the replay folder
+    window = game.JumpIt(game.start_loading(ghost_folder=None), ghost_folder=None)
+    window.setup()
+    try:
+        def draw():
+            window.on_draw()
+            window.ctx.finish()
+
+        # The first draws create the GL buffers, they aren't part of the benchmark
+        for _ in range(5):
+            draw()
+        results["draw"] = measure(draw, number=20, repeats=5)
+
+        window.changeInstructState()
+        window.win_text = "You Win!"
+        window.high_score_text = "Score\t|\t\tDate\n" + "1000\t|\t2023-10-13\n" * 10
+        window.reset_text = "Press \"r\" to reset"
+        for _ in range(5):
+            draw()
+        results["draw_overlay"] = measure(draw, number=20, repeats=5)
+
+        measure_ghosts(results, window)
+    finally:
+        window.score_writer.close()
+        window.close()
+
+
+# Opens the game in a fresh process the way main() does, runs frames until it can be played and prints its startup times
+STARTUP_SCRIPT = """
+import importlib.util, json, sys
+spec = importlib.util.spec_from_file_location("jumpit_game", sys.argv[1])
+game = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(game)
+window = game.JumpIt(game.start_loading())
+while not window.started:
+    window.dispatch_events()
+    window.on_draw()
+    window.flip()
+    window.on_update(1 / 60)
+window.loader.close()
+window.score_writer.close()
+print(json.dumps(window.loader.milestones))
+window.close()
+"""
+
+
+# Time to the loading screen's first frame and until the game takes input, each from a cold process
+def bench_startup(results):
+    from jumpit.loader import FIRST_FRAME, INTERACTIVE
+
+    require_display()
+    first_frame = []
+    interactive = []
+    for _ in range(5):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, game_path()], cwd=os.path.dirname(game_path()), capture_output=True, text=True, check=True).stdout
+        milestones = json.loads(output.splitlines()[-1])
+        first_frame.append(milestones[FIRST_FRAME])
+        interactive.append(milestones[INTERACTIVE])
+    results["startup_first_frame"] = first_frame
+    results["startup_interactive"] = interactive
+
+
+BENCHMARKS = {
+    "setup": bench_setup,
+    "setup_tilemap": bench_setup_tilemap,
+    "reset": bench_reset,
+    "step": bench_step,
+    "collision": bench_collision,
+    "scores": bench_scores,
+    "levels": bench_levels,
+    "server": bench_server,
+    "sound": bench_sound,
+    "draw": bench_draw,
+    "startup": bench_startup,
+}
+
+
+# Result of a benchmark, benchmark is the name in BENCHMARKS of the one that measured it
+def summarize(times, benchmark):
+    return {"median_ms": statistics.median(times) * 1000, "min_ms": min(times) * 1000, "repeats": len(times), "benchmark": benchmark}
+
+
+# Compares results with a baseline, returns the names of results that got slower than the tolerance allows
+# or are in the baseline but weren't measured although the benchmark that measures them ran
+def compare(results, baseline, tolerance, ran):
+    regressions = []
+    for name, entry in sorted(baseline.items()):
+        benchmark = entry.get("benchmark")
+        if name not in results and (benchmark is None or benchmark in ran):
+            print(f"{name:24} {'':>12}      no result")
+            regressions.append(name)
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            print(f"{name:24} {result['median_ms']:12.4f} ms   (no baseline)")
+            continue
+        ratio = result["median_ms"] / baseline[name]["median_ms"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:24} {result['median_ms']:12.4f} ms   {ratio:6.2f}x baseline{flag}")
+    return regressions
+
+
+# Benchmarks the game loop and score hot paths: python -m jumpit.bench [--headless] [--save-baseline]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Jump It's loading, simulation, drawing and score saving.")
+    parser.add_argument("benchmarks", nargs="*", help=f"benchmarks to run, all of them by default: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", default=RESULTS_FILE, help="where to write the results")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline to compare the results with")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="slowdown allowed before a benchmark fails, 0.25 is 25%%")
+    parser.add_argument("--headless", action="store_true", help="draw without a display, needs EGL")
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name}")
+
+    # Has to be set before arcade is imported for the first time
+    if args.headless:
+        os.environ["ARCADE_HEADLESS"] = "1"
+
+    results = {}
+    ran = set()
+    for name in args.benchmarks or list(BENCHMARKS):
+        raw = {}
+        try:
+            BENCHMARKS[name](raw)
+        except NoDisplay as error:
+            # Drawing needs a display or EGL, the other benchmarks still count without it
+            print(f"{name}: skipped, {error}", file=sys.stderr)
+            continue
+        ran.add(name)
+        results.update((key, summarize(times, name)) for key, times in raw.items())
+
+    import arcade
+
+    report = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "arcade": arcade.version.VERSION,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as fout:
+        json.dump(report, fout, indent=2)
+
+    baseline = {"results": {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fin:
+            baseline = json.load(fin)
+    regressions = compare(results, baseline["results"], args.tolerance, ran)
+
+    # The benchmarks that ran replace their own results in the baseline, the others keep theirs
+    if args.save_baseline:
+        merged = {}
+        for name, entry in baseline["results"].items():
+            if name in results:
+                merged[name] = results[name]
+            elif entry.get("benchmark") not in ran:
+                merged[name] = entry
+        merged.update(results)
+        report["results"] = merged
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as fout:
+            json.dump(report, fout, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than the baseline or without a result: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
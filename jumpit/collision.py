@@ -0,0 +1,73 @@
+import arcade
+
+
+# Merges a set of solid (column, row) cells into rectangles as (column, row, columns wide, rows tall).
+# Runs are taken along each row, then grown over the following rows while the whole run stays solid.
+def merge_cells(cells):
+    remaining = set(cells)
+    rectangles = []
+    for column, row in sorted(cells, key=lambda cell: (cell[1], cell[0])):
+        if (column, row) not in remaining:
+            continue
+
+        end = column
+        while (end + 1, row) in remaining:
+            end += 1
+        run = range(column, end + 1)
+
+        last_row = row
+        while all((cell_column, last_row + 1) in remaining for cell_column in run):
+            last_row += 1
+
+        for cell_row in range(row, last_row + 1):
+            for cell_column in run:
+                remaining.discard((cell_column, cell_row))
+        rectangles.append((column, row, end - column + 1, last_row - row + 1))
+    return rectangles
+
+
+# Checks if a tile's hit box is its whole cell, only those tiles can be merged without changing the collisions
+def fills_cell(sprite, tile_width, tile_height):
+    points = sprite.get_hit_box()
+    if len(points) != 4:
+        return False
+    half_width = tile_width / 2 / sprite.scale
+    half_height = tile_height / 2 / sprite.scale
+    corners = {(-half_width, -half_height), (half_width, -half_height), (half_width, half_height), (-half_width, half_height)}
+    return set(map(tuple, points)) == corners and sprite.width == tile_width and sprite.height == tile_height
+
+
+# Works out the walls the physics engine collides with from a tile layer, as a plain list of sprites.
+# Tiles that fill their cell are merged into as few rectangles as possible, any other tile is kept as it is.
+# The tiles themselves are untouched, so the layer still draws the same.
+# The merged rectangles are never drawn, so they have no texture and don't take up room in the texture atlas
+# however many different sizes a level has. Nothing here needs a window, so walls can be worked out on any thread.
+def collider_sprites(tiles, tile_width, tile_height):
+    colliders = []
+    if not tiles:
+        return colliders
+
+    # Grid cells are counted from the bottom left tile of the layer
+    origin_x = min(tile.center_x for tile in tiles) - tile_width / 2
+    origin_y = min(tile.center_y for tile in tiles) - tile_height / 2
+
+    cells = set()
+    for tile in tiles:
+        column = round((tile.center_x - tile_width / 2 - origin_x) / tile_width)
+        row = round((tile.center_y - tile_height / 2 - origin_y) / tile_height)
+        on_grid = tile.center_x == origin_x + column * tile_width + tile_width / 2 and tile.center_y == origin_y + row * tile_height + tile_height / 2
+        if on_grid and tile.angle == 0 and fills_cell(tile, tile_width, tile_height):
+            cells.add((column, row))
+        else:
+            colliders.append(tile)
+
+    for column, row, columns, rows in merge_cells(cells):
+        width = columns * tile_width
+        height = rows * tile_height
+        collider = arcade.Sprite()
+        collider.width = width
+        collider.height = height
+        collider.set_hit_box([(-width / 2, -height / 2), (width / 2, -height / 2), (width / 2, height / 2), (-width / 2, height / 2)])
+        collider.position = (origin_x + column * tile_width + width / 2, origin_y + row * tile_height + height / 2)
+        colliders.append(collider)
+    return colliders
@@ -0,0 +1,83 @@
+# Constants for screen
+SCREEN_WIDTH = 1248
+SCREEN_HEIGHT = 720
+SCREEN_TITLE = "Jump It"
+
+# Constants used to scale sprites
+TILE_SCALING = 1
+CHARACTER_SCALING = TILE_SCALING
+SPRITE_PIXEL_SIZE = 128
+GRID_PIXEL_SIZE = SPRITE_PIXEL_SIZE * TILE_SCALING
+
+# Movement speeds for player, movement and jump speed are in pixels per simulation tick
+PLAYER_MOVEMENT_SPEED = 10
+GRAVITY = 1.4
+PLAYER_JUMP_SPEED = 25
+
+# How many times a second the game rules run and the screen is drawn, these can be set separately
+SIMULATION_RATE = 60
+RENDER_RATE = 60
+
+# Most simulation ticks run in one frame to catch up after a slow one, any more lost time is skipped
+MAX_CATCH_UP_STEPS = 5
+
+# Times each phase of a frame from the start, the overlay can also be turned on with F3
+PROFILE_ON_START = False
+
+# How often the timing overlay text is refreshed, in seconds
+PROFILE_OVERLAY_INTERVAL = 0.5
+
+# Threads the window loads sounds, textures and the level on while it shows the loading screen
+LOADER_THREADS = 2
+
+# Where python -m jumpit.server listens for remote players by default
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 7777
+
+# Every session played in the window is saved here as a replay when this is on
+RECORD_REPLAYS = True
+REPLAY_FOLDER = "replays"
+
+# Spike hits, wins, resets and instruction toggles of every session are saved here when this is on, in blocks of this many events
+RECORD_TELEMETRY = True
+TELEMETRY_FOLDER = "telemetry"
+TELEMETRY_CAPACITY = 4096
+
+# Best runs from the saved replays shown racing the player, and how see-through they are (0 to 255)
+GHOST_COUNT = 10
+GHOST_ALPHA = 90
+
+# Constants for player spawn point
+PLAYER_START_X = 2
+PLAYER_START_Y = 1
+
+# Score the player starts each game with, and what each spike costs
+START_SCORE = 1000
+SPIKE_PENALTY = 50
+
+# Constants used to track if the player is facing left or right
+RIGHT_FACING = 0
+LEFT_FACING = 1
+
+# Constants for layer names within MapFinal.JSON
+LAYER_NAME_PLATFORMS = "Platforms"
+LAYER_NAME_BACKGROUND = "Background"
+LAYER_NAME_PLAYER = "Player"
+LAYER_NAME_SPIKE = "Spike"
+LAYER_NAME_DUCK = "Duck"
+
+# Layers that never change while a level is played, drawn from one baked texture
+STATIC_LAYERS = [LAYER_NAME_BACKGROUND, LAYER_NAME_PLATFORMS]
+
+# Levels are loaded in chunks this many tiles wide, and only the chunks this close to the player's chunk are in play.
+# The chunks one further out are built in the background before the player gets to them.
+CHUNK_COLUMNS = 28
+STREAM_RADIUS = 1
+
+# Default map and the offset it is drawn at
+MAP_NAME = "assets/MapFinal5.JSON"
+MAP_OFFSET = (-48, 0)
+
+# Levels played one after another, and how much memory the levels kept built for switching back to can take
+LEVEL_MANIFEST = "assets/levels.json"
+LEVEL_CACHE_BYTES = 64 * 1024 * 1024
@@ -0,0 +1,65 @@
+import arcade
+
+from jumpit.constants import RIGHT_FACING, LEFT_FACING
+from jumpit.textures import TEXTURES
+
+# Images the entities are drawn with
+IDLE_IMAGE = "assets/Base_Model.png"
+JUMP_IMAGE = "assets/Jump.png"
+WALK_IMAGE = "assets/Walk.png"
+ENTITY_IMAGES = [IDLE_IMAGE, JUMP_IMAGE, WALK_IMAGE]
+
+
+# Loads a pair of textures, one for right-facing and the other for left-facing.
+# They come from the shared registry, so every entity uses the same textures and hit boxes.
+def load_texture_pair(filename):
+    return TEXTURES.pair(filename)
+
+
+class Entity(arcade.Sprite):
+    def __init__(self, name_folder, name_file):
+        super().__init__()
+
+        # Default to facing right
+        self.facing_direction = RIGHT_FACING
+
+        # Load textures
+        self.idle_texture_pair = load_texture_pair(IDLE_IMAGE)
+        self.jump_texture_pair = load_texture_pair(JUMP_IMAGE)
+        self.walk_textures = load_texture_pair(WALK_IMAGE)
+
+        # Set the initial texture
+        self.texture = self.idle_texture_pair[0]
+
+        # Set hit box
+        self.set_hit_box(self.texture.hit_box_points)
+
+
+class PlayerCharacter(Entity):
+    def __init__(self):
+
+        # Set up parent class
+        super().__init__("assets", "Base_Model.png")
+
+        # Track if jumping
+        self.jumping = False
+
+    def update_animation(self, delta_time: float = 1 / 60):
+        # Check if need to face right or left
+        if self.change_x < 0 and self.facing_direction == RIGHT_FACING:
+            self.facing_direction = LEFT_FACING
+        elif self.change_x > 0 and self.facing_direction == LEFT_FACING:
+            self.facing_direction = RIGHT_FACING
+
+        # Jumping
+        if self.change_y > 0 or self.change_y < 0:
+            self.texture = self.jump_texture_pair[self.facing_direction]
+            return
+
+        # Idle
+        if self.change_x == 0:
+            self.texture = self.idle_texture_pair[self.facing_direction]
+            return
+
+        # Walking
+        self.texture = self.walk_textures[self.facing_direction]
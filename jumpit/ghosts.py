@@ -0,0 +1,202 @@
+import glob
+import os
+import struct
+from array import array
+
+import arcade
+
+from jumpit.constants import GHOST_ALPHA, LEFT_FACING, RIGHT_FACING
+from jumpit.entities import IDLE_IMAGE, JUMP_IMAGE, WALK_IMAGE
+from jumpit.replay import REPLAY_EXTENSION, Replay
+from jumpit.textures import TEXTURES
+
+# Where each replay's best run is kept once it has been played back, next to the replay
+GHOST_EXTENSION = ".ghost"
+GHOST_MAGIC = b"JIGH"
+GHOST_VERSION = 1
+
+# Magic, version, score and number of ticks, followed by the x positions, y positions and frames of every tick
+HEADER = struct.Struct("<4sBiI")
+
+# Textures a ghost can show, a frame is an index into this
+FRAMES = [(image, facing == LEFT_FACING) for image in (IDLE_IMAGE, JUMP_IMAGE, WALK_IMAGE) for facing in (RIGHT_FACING, LEFT_FACING)]
+
+
+# Where the player was and what it looked like on every tick of one run that reached the duck
+class GhostTrack:
+    def __init__(self, score, xs, ys, frames):
+        self.score = score
+        self.xs = xs
+        self.ys = ys
+        self.frames = frames
+
+    @property
+    def ticks(self):
+        return len(self.xs)
+
+    def to_bytes(self):
+        return HEADER.pack(GHOST_MAGIC, GHOST_VERSION, self.score, self.ticks) + self.xs.tobytes() + self.ys.tobytes() + self.frames.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, score, ticks = HEADER.unpack_from(data)
+        if magic != GHOST_MAGIC or version != GHOST_VERSION:
+            raise ValueError("Not a Jump It ghost")
+        position = HEADER.size
+        xs = array("f")
+        ys = array("f")
+        frames = array("B")
+        xs.frombytes(data[position:position + ticks * 4])
+        ys.frombytes(data[position + ticks * 4:position + ticks * 8])
+        frames.frombytes(data[position + ticks * 8:position + ticks * 9])
+        if len(frames) != ticks:
+            raise ValueError("Ghost is cut short")
+        return cls(score, xs, ys, frames)
+
+
+# Plays a replay back and keeps its best run, the highest score and then the fewest ticks from a start or reset to the duck.
+# Returns None if no run in the replay reached the duck.
+def record_track(replay, sim):
+    from jumpit.simulation import EVENT_RESET, EVENT_WIN
+
+    frame_of = {TEXTURES.get(image, flipped): frame for frame, (image, flipped) in enumerate(FRAMES)}
+    player = sim.player_sprite
+    sim.new_game()
+    best = None
+    track = GhostTrack(0, array("f"), array("f"), array("B"))
+    tick_time = 1 / replay.rate
+    for inputs in replay.inputs():
+        events = sim.step(inputs, tick_time)
+        if any(event == EVENT_RESET for event, data in events):
+            track = GhostTrack(0, array("f"), array("f"), array("B"))
+        if track is None:
+            continue
+        track.xs.append(player.center_x)
+        track.ys.append(player.center_y)
+        track.frames.append(frame_of.get(player.texture, 0))
+        for event, data in events:
+            if event == EVENT_WIN:
+                track.score = data
+                if best is None or (track.score, -track.ticks) > (best.score, -best.ticks):
+                    best = track
+                # Nothing after the duck counts until the next reset
+                track = None
+                break
+    return best
+
+
+# The best run of a replay, played back the first time and read from its ghost file after that.
+# replay is the replay at path if it was already loaded.
+def replay_track(path, sim, replay=None):
+    ghost_path = os.path.splitext(path)[0] + GHOST_EXTENSION
+    try:
+        if os.path.getmtime(ghost_path) >= os.path.getmtime(path):
+            with open(ghost_path, "rb") as fin:
+                data = fin.read()
+            return GhostTrack.from_bytes(data) if data else None
+    except (OSError, ValueError, struct.error):
+        pass
+
+    track = record_track(replay if replay is not None else Replay.load(path), sim)
+    try:
+        # An empty file marks a replay that never reached the duck, so it isn't played back again either
+        temp_path = ghost_path + ".tmp"
+        with open(temp_path, "wb") as fout:
+            fout.write(track.to_bytes() if track is not None else b"")
+        os.replace(temp_path, ghost_path)
+    except OSError:
+        # Not being able to save only means the replay is played back again next run
+        pass
+    return track
+
+
+# Best runs among the replays in a folder that were played on the given map, best first.
+# Nothing here needs a window, so the ghosts can be loaded on another thread while the game starts.
+def load_tracks(folder, map_name, count):
+    from jumpit.simulation import Simulation
+
+    sim = None
+    tracks = []
+    for path in sorted(glob.glob(os.path.join(folder, "*" + REPLAY_EXTENSION))):
+        # A replay that can't be read, like one cut off by a crash, is left out and the others still race
+        try:
+            replay = Replay.load(path)
+        except (OSError, ValueError):
+            continue
+        if replay.map_name != map_name:
+            continue
+        if sim is None:
+            sim = Simulation(map_name)
+            sim.setup()
+        track = replay_track(path, sim, replay)
+        if track is not None:
+            tracks.append(track)
+    if sim is not None:
+        sim.stream.close()
+    tracks.sort(key=lambda track: (-track.score, track.ticks))
+    return tracks[:count]
+
+
+# The best runs in a folder laid out for drawing
+def load_race(folder, map_name, count):
+    return GhostRace(load_tracks(folder, map_name, count))
+
+
+# Draws recorded runs as see-through players racing the one playing, however many there are, from one sprite list.
+# The tracks are laid out tick by tick, every ghost's position for a tick next to each other, in the same layout as the
+# sprite list's own position and texture buffers. Each frame copies one tick's slice straight into those buffers,
+# so moving 500 ghosts is two slice copies and one draw call, the same as moving one.
+# Ghosts never touch physics or triggers, and one that finished waits at the duck.
+# Laying out the tracks doesn't need a window, the sprite list is made on the first draw.
+class GhostRace:
+    def __init__(self, tracks):
+        self.count = len(tracks)
+        self.ticks = max((track.ticks for track in tracks), default=0)
+
+        # Position of every ghost and frame every ghost shows, by tick. A run shorter than the longest is held on its last tick
+        self.positions = array("f", bytes(self.ticks * self.count * 8))
+        self.frames = array("B", bytes(self.ticks * self.count))
+        for number, track in enumerate(tracks):
+            padding = self.ticks - track.ticks
+            self.positions[number * 2::self.count * 2] = track.xs + array("f", track.xs[-1:]) * padding
+            self.positions[number * 2 + 1::self.count * 2] = track.ys + array("f", track.ys[-1:]) * padding
+            self.frames[number::self.count] = track.frames + array("B", track.frames[-1:]) * padding
+
+        self.sprite_list = None
+        self.texture_slots = None
+
+        # Tick shown last, the buffers are only touched when it changes
+        self.shown = None
+
+    # One sprite per ghost in a list with an atlas of its own holding only the frames, and the atlas slot of every ghost's
+    # frame on every tick in the layout of the list's texture buffer
+    def build(self):
+        self.sprite_list = arcade.SpriteList(atlas=arcade.TextureAtlas((256, 256)), capacity=self.count)
+        for _ in range(self.count):
+            sprite = arcade.Sprite(texture=TEXTURES.get(*FRAMES[0]))
+            sprite.alpha = GHOST_ALPHA
+            self.sprite_list.append(sprite)
+        self.sprite_list.initialize()
+        slots = [self.sprite_list.atlas.add(TEXTURES.get(image, flipped))[0] for image, flipped in FRAMES]
+        self.texture_slots = array("f", array("B", self.frames.tobytes().translate(bytes(slots).ljust(256, b"\0"))))
+
+    # Moves every ghost to where its run was the given number of ticks after it started
+    def show(self, tick):
+        tick = max(0, min(tick, self.ticks - 1))
+        if tick == self.shown:
+            return
+        self.shown = tick
+        count = self.count
+        sprite_list = self.sprite_list
+        sprite_list._sprite_pos_data[0:count * 2] = self.positions[tick * count * 2:(tick + 1) * count * 2]
+        sprite_list._sprite_texture_data[0:count] = self.texture_slots[tick * count:(tick + 1) * count]
+        sprite_list._sprite_pos_changed = True
+        sprite_list._sprite_texture_changed = True
+
+    def draw(self, tick):
+        if not self.count:
+            return
+        if self.sprite_list is None:
+            self.build()
+        self.show(tick)
+        self.sprite_list.draw()
@@ -0,0 +1,131 @@
+import argparse
+import os
+import sys
+import time
+
+from jumpit.constants import MAP_NAME, MAP_OFFSET, TILE_SCALING
+from jumpit.telemetry import COLUMNS, KIND_NAMES, read_blocks
+
+# Tiles listed when no file is asked for
+TOP_TILES = 10
+
+
+# Every event in the files recorded on a map as one NumPy array per column, files from other maps are left out.
+# Map paths are compared normalized, like LevelManager.index. Run numbers start again in every file,
+# so the runs are counted per file.
+def load_events(paths, map_name):
+    import numpy as np
+
+    wanted = os.path.normpath(map_name)
+    parts = {name: [] for name, code in COLUMNS}
+    files = 0
+    runs = 0
+    for path in paths:
+        try:
+            file_map, blocks = read_blocks(path)
+        except (OSError, ValueError) as error:
+            print(f"{path}: skipped, {error}", file=sys.stderr)
+            continue
+        if os.path.normpath(file_map) != wanted:
+            continue
+        files += 1
+        file_runs = []
+        for block in blocks:
+            for name, code in COLUMNS:
+                parts[name].append(np.frombuffer(block[name], dtype=code))
+            file_runs.append(parts["run"][-1])
+        if file_runs:
+            runs += len(np.unique(np.concatenate(file_runs)))
+    columns = {}
+    for name, code in COLUMNS:
+        columns[name] = np.concatenate(parts[name]) if parts[name] else np.zeros(0, dtype=code)
+    return columns, files, runs
+
+
+# Events of one kind counted per tile as a (rows, columns) array, row 0 is the bottom of the map.
+# Events outside the map are dropped.
+def tile_counts(columns, kind, width, height, tile_width, tile_height, offset=MAP_OFFSET):
+    import numpy as np
+
+    chosen = columns["kind"] == kind
+    tile_columns = np.floor((columns["x"][chosen] - offset[0]) / tile_width).astype(np.int64)
+    tile_rows = np.floor((columns["y"][chosen] - offset[1]) / tile_height).astype(np.int64)
+    inside = (tile_columns >= 0) & (tile_columns < width) & (tile_rows >= 0) & (tile_rows < height)
+    cells = tile_rows[inside] * width + tile_columns[inside]
+    return np.bincount(cells, minlength=width * height).reshape(height, width)
+
+
+# Heatmap image with scale pixels per tile, dark where nothing happened and going through red to yellow where most did.
+# Counts are on a log scale so a few tiles everyone dies on don't wash out the rest.
+def heatmap_image(counts, scale):
+    import numpy as np
+    import PIL.Image
+
+    heat = np.log1p(counts.astype(np.float64))
+    if heat.max() > 0:
+        heat /= heat.max()
+    pixels = np.zeros(counts.shape + (3,), dtype=np.uint8)
+    pixels[..., 0] = np.clip(heat * 2, 0, 1) * 255
+    pixels[..., 1] = np.clip(heat * 2 - 1, 0, 1) * 255
+    pixels[..., 2] = (counts == 0) * 40
+    # Rows count up from the bottom of the map, images count down from the top
+    pixels = np.repeat(np.repeat(pixels[::-1], scale, axis=0), scale, axis=1)
+    return PIL.Image.fromarray(pixels, "RGB")
+
+
+# Turns telemetry into per-tile heatmaps: python -m jumpit.heatmap telemetry/*.jtl --image deaths.png
+def main(argv=None):
+    kinds = {name: kind for kind, name in KIND_NAMES.items()}
+    parser = argparse.ArgumentParser(description="Count where Jump It events happened per tile, spike deaths by default.")
+    parser.add_argument("files", nargs="+", help="telemetry files to read")
+    parser.add_argument("--map", default=MAP_NAME, help="map the telemetry was recorded on, files from other maps are skipped")
+    parser.add_argument("--kind", default="spike", choices=sorted(kinds), help="events to count")
+    parser.add_argument("--top", type=int, default=TOP_TILES, help="tiles with the most events to list")
+    parser.add_argument("--csv", default=None, help="CSV file for the count of every tile with events")
+    parser.add_argument("--image", default=None, help="PNG file for the heatmap")
+    parser.add_argument("--scale", type=int, default=16, help="pixels per tile in the heatmap image")
+    args = parser.parse_args(argv)
+
+    # NumPy is only needed for this tool, the game runs without it
+    try:
+        import numpy as np
+    except ImportError:
+        parser.error("the heatmap tool needs NumPy, install it with pip install numpy")
+
+    # Imported here so the tool can tell about NumPy before arcade is loaded
+    from jumpit.streaming import read_level
+
+    meta = read_level(args.map)
+    if meta is None:
+        parser.error(f"can't read the size of map {args.map}")
+    width = meta["width"]
+    height = meta["height"]
+    tile_width = meta["tile_width"] * TILE_SCALING
+    tile_height = meta["tile_height"] * TILE_SCALING
+
+    start = time.perf_counter()
+    columns, files, runs = load_events(args.files, args.map)
+    loaded = time.perf_counter()
+    counts = tile_counts(columns, kinds[args.kind], width, height, tile_width, tile_height)
+    counted = time.perf_counter()
+
+    total = int(counts.sum())
+    print(f"{len(columns['kind'])} events from {files} files, {total} {args.kind} events on the map in {runs} runs "
+          f"(read in {loaded - start:.2f} s, counted in {counted - loaded:.3f} s)")
+
+    rows, cols = np.nonzero(counts)
+    order = np.argsort(-counts[rows, cols], kind="stable")
+    for rank, index in enumerate(order[:args.top], 1):
+        count = int(counts[rows[index], cols[index]])
+        print(f"{rank:3}. tile ({cols[index]}, {rows[index]}): {count} ({count / total:.1%})")
+
+    if args.csv:
+        with open(args.csv, "w") as fout:
+            fout.write("column,row,count\n")
+            fout.write("".join(f"{column},{row},{counts[row, column]}\n" for row, column in zip(rows, cols)))
+    if args.image:
+        heatmap_image(counts, args.scale).save(args.image)
+
+
+if __name__ == "__main__":
+    main()
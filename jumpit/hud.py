@@ -0,0 +1,82 @@
+import arcade
+import pyglet
+
+from jumpit.constants import SCREEN_WIDTH, SCREEN_HEIGHT
+
+
+# A piece of screen text that keeps its layout between frames.
+# The layout is only rebuilt when the string changes, and an empty string leaves nothing to draw.
+class HudText:
+    def __init__(self, batch, x, y, font_size, width=0, align="left", bold=False, multiline=False):
+        self.value = ""
+
+        # Same label arcade.draw_text would build, centered text has to be multiline for pyglet to align it
+        self.label = pyglet.text.Label(
+            text="",
+            x=x,
+            y=y,
+            font_name=("calibri", "arial"),
+            font_size=font_size,
+            color=arcade.get_four_byte_color(arcade.csscolor.BLACK),
+            width=width or None,
+            align=align,
+            bold=bold,
+            multiline=multiline or align != "left",
+            batch=batch,
+        )
+
+    def set(self, value):
+        if value != self.value:
+            self.value = value
+            self.label.text = value
+
+
+# All of the text drawn over the scene, built once and updated only when the game changes it.
+# Every label shares one batch, so the whole HUD is a single draw no matter how much text is up.
+class Hud:
+    def __init__(self):
+        self.batch = pyglet.graphics.Batch()
+        self.score = HudText(self.batch, 10, 10, 25)
+        self.instruct_prompt = HudText(self.batch, 10, SCREEN_HEIGHT - 25, 15)
+        self.win = HudText(self.batch, 0, SCREEN_HEIGHT*0.78, 100, SCREEN_WIDTH, align="center")
+        self.high_score = HudText(self.batch, SCREEN_WIDTH*0.38, SCREEN_HEIGHT*0.70, 18, SCREEN_WIDTH, align="left", bold=True, multiline=True)
+        self.reset = HudText(self.batch, 0, 50, 50, SCREEN_WIDTH, align="center")
+        self.instruct_header = HudText(self.batch, 0, SCREEN_HEIGHT*0.67, 60, SCREEN_WIDTH, align="center")
+        self.instruct_body = HudText(self.batch, SCREEN_WIDTH*0.2, SCREEN_HEIGHT*0.60, 20, SCREEN_WIDTH, align="left", multiline=True)
+
+        self.instruct_prompt.set("Press 'I' for instructions")
+
+        # Frame timings, only filled in while the profiler overlay is on
+        self.profile = HudText(self.batch, SCREEN_WIDTH*0.70, SCREEN_HEIGHT - 25, 11, int(SCREEN_WIDTH*0.30), align="left", multiline=True)
+
+        # Last score shown, so the string is only formatted when it changes
+        self.shown_score = None
+
+    def update(self, score, win_text, high_score_text, reset_text, instruct_header_text, instruct_body_text):
+        if score != self.shown_score:
+            self.shown_score = score
+            self.score.set(f"Score: {score}")
+        self.win.set(win_text)
+        self.high_score.set(high_score_text)
+        self.reset.set(reset_text)
+        self.instruct_header.set(instruct_header_text)
+        self.instruct_body.set(instruct_body_text)
+
+    def draw(self):
+        # Raw pyglet drawing needs arcade's projection handed over first
+        with arcade.get_window().ctx.pyglet_rendering():
+            self.batch.draw()
+
+
+# Text shown while the game is loading, apart from the HUD so the first frame only has to lay out one label
+class LoadingText:
+    def __init__(self):
+        self.batch = pyglet.graphics.Batch()
+        self.text = HudText(self.batch, 0, SCREEN_HEIGHT / 2, 40, SCREEN_WIDTH, align="center")
+
+    def update(self, loaded, total):
+        self.text.set(f"Loading... {loaded}/{total}")
+
+    def draw(self):
+        with arcade.get_window().ctx.pyglet_rendering():
+            self.batch.draw()
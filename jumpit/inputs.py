@@ -0,0 +1,31 @@
+from typing import NamedTuple
+
+# Bits used when an input state is packed into a single int
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_UP = 4
+INPUT_RESET = 8
+
+
+# The keys that are held down during one tick
+class InputState(NamedTuple):
+    left: bool = False
+    right: bool = False
+    up: bool = False
+    reset: bool = False
+
+    # Packs the flags into an int so they can be stored or sent cheaply
+    def to_bits(self):
+        return (
+            (INPUT_LEFT if self.left else 0)
+            | (INPUT_RIGHT if self.right else 0)
+            | (INPUT_UP if self.up else 0)
+            | (INPUT_RESET if self.reset else 0)
+        )
+
+    @classmethod
+    def from_bits(cls, bits):
+        return cls(bool(bits & INPUT_LEFT), bool(bits & INPUT_RIGHT), bool(bits & INPUT_UP), bool(bits & INPUT_RESET))
+
+
+NO_INPUT = InputState()
@@ -0,0 +1,157 @@
+import argparse
+import collections
+import datetime
+import sys
+import time
+
+from jumpit.constants import SPIKE_PENALTY
+from jumpit.scores import SCORE_FILE, TOP_COUNT
+
+# Bytes of the history read at a time, memory use stays around a few times this however long the history is
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Percentiles shown when none are asked for
+PERCENTILES = (10, 25, 50, 75, 90, 99)
+
+# Widest bar in the histogram
+BAR_WIDTH = 50
+
+
+# Reads the history a chunk at a time and counts how many rows there are of each (score, date).
+# The same row turns up over and over since scores move in steps of the spike penalty and many games are played a day,
+# so the lines of a chunk are counted as whole strings, which happens in C, and each distinct line is only parsed once.
+# Memory grows with the number of distinct scores and dates, never with the number of rows.
+def count_rows(path, chunk_size=CHUNK_SIZE):
+    lines = collections.Counter()
+    with open(path, "rb") as fin:
+        rest = b""
+        while True:
+            chunk = fin.read(chunk_size)
+            if not chunk:
+                break
+            chunk = rest + chunk
+            end = chunk.rfind(b"\n") + 1
+            rest = chunk[end:]
+            lines.update(chunk[:end].splitlines())
+        # A last row without its newline was cut off by a crash, the score store drops it too
+
+    counts = collections.Counter()
+    for line, count in lines.items():
+        score_text, _, date_text = line.partition(b"|")
+        try:
+            score = int(score_text)
+            date = datetime.date.fromisoformat(date_text.strip().decode())
+        except ValueError:
+            continue
+        counts[score, date] += count
+    return counts
+
+
+# Best scores first, each as many times as it was reached, until there are n of them
+def top_scores(score_counts, n):
+    top = []
+    for score in sorted(score_counts, reverse=True):
+        top += [score] * min(score_counts[score], n - len(top))
+        if len(top) == n:
+            break
+    return top
+
+
+# Score at each percentile by nearest rank, from counts of each score
+def percentiles(score_counts, wanted):
+    total = sum(score_counts.values())
+    results = {}
+    ranks = sorted((max(1, -(-percentile * total // 100)), percentile) for percentile in wanted)
+    seen = 0
+    position = 0
+    for score in sorted(score_counts):
+        seen += score_counts[score]
+        while position < len(ranks) and ranks[position][0] <= seen:
+            results[ranks[position][1]] = score
+            position += 1
+    return results
+
+
+# Counts of each score, grouped by what key gives for each date
+def group_scores(counts, key):
+    groups = collections.defaultdict(collections.Counter)
+    for (score, date), count in counts.items():
+        groups[key(date)][score] += count
+    return groups
+
+
+def week_of(date):
+    year, week, day = date.isocalendar()
+    return f"{year}-W{week:02}"
+
+
+def print_top_lists(title, groups, n, last):
+    print(f"{title} top {n}")
+    for group in sorted(groups)[-last:] if last else sorted(groups):
+        print(f"  {group}: {', '.join(str(score) for score in top_scores(groups[group], n))}")
+
+
+def print_histogram(score_counts, width):
+    bins = collections.Counter()
+    for score, count in score_counts.items():
+        bins[score // width * width] += count
+    most = max(bins.values())
+    print(f"Score distribution, bins of {width}")
+    for start in range(min(bins), max(bins) + width, width):
+        count = bins.get(start, 0)
+        print(f"  {start:>6} to {start + width - 1:<6} {count:>12}  {'#' * round(count / most * BAR_WIDTH)}")
+
+
+# Reports on the whole score history without loading it: python -m jumpit.leaderboard --daily --percentiles
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Top lists, score distribution, percentiles and best scores per day from the Jump It score history.")
+    parser.add_argument("path", nargs="?", default=SCORE_FILE, help="score history to read")
+    parser.add_argument("--daily", action="store_true", help="top scores of each day")
+    parser.add_argument("--weekly", action="store_true", help="top scores of each week")
+    parser.add_argument("--histogram", action="store_true", help="how many scores fall in each range")
+    parser.add_argument("--percentiles", action="store_true", help="score at each percentile")
+    parser.add_argument("--best", action="store_true", help="best score of each day")
+    parser.add_argument("--top", type=int, default=TOP_COUNT, help="scores in each top list")
+    parser.add_argument("--last", type=int, default=0, help="only show the last this many days or weeks, all of them by default")
+    parser.add_argument("--bin", type=int, default=SPIKE_PENALTY, help="width of each histogram bin")
+    parser.add_argument("--at", default=",".join(str(percentile) for percentile in PERCENTILES), help="comma separated percentiles to show")
+    args = parser.parse_args(argv)
+    wanted = [float(value) for value in args.at.split(",")]
+    if not any([args.daily, args.weekly, args.histogram, args.percentiles, args.best]):
+        args.daily = args.weekly = args.histogram = args.percentiles = args.best = True
+
+    start = time.perf_counter()
+    try:
+        counts = count_rows(args.path)
+    except OSError as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - start
+
+    score_counts = collections.Counter()
+    for (score, date), count in counts.items():
+        score_counts[score] += count
+    rows = sum(score_counts.values())
+    print(f"{rows} scores over {len({date for score, date in counts})} days read in {elapsed:.2f} s", file=sys.stderr)
+    if not rows:
+        return
+
+    days = group_scores(counts, lambda date: date.isoformat())
+    if args.daily:
+        print_top_lists("Daily", days, args.top, args.last)
+    if args.weekly:
+        print_top_lists("Weekly", group_scores(counts, week_of), args.top, args.last)
+    if args.histogram:
+        print_histogram(score_counts, args.bin)
+    if args.percentiles:
+        print("Percentiles")
+        for percentile, score in sorted(percentiles(score_counts, wanted).items()):
+            print(f"  p{percentile:g}: {score}")
+    if args.best:
+        print("Best score per day")
+        for day in sorted(days)[-args.last:] if args.last else sorted(days):
+            best = max(days[day])
+            print(f"  {day}: {best} (reached {days[day][best]} times)")
+
+
+if __name__ == "__main__":
+    main()
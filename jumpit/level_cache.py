@@ -0,0 +1,335 @@
+import hashlib
+import json
+import os
+import re
+import struct
+import sys
+from array import array
+from pathlib import Path
+
+import arcade
+import pytiled_parser
+
+from jumpit.constants import MAP_OFFSET, TILE_SCALING
+
+# Level caches sit next to the map they were compiled from
+CACHE_EXTENSION = ".lvl"
+CACHE_MAGIC = b"JITL"
+CACHE_VERSION = 1
+
+# Magic, version, content hash of the sources and the length of the metadata that follows
+HEADER = struct.Struct("<4sH20sI")
+
+# Flags Tiled stores in the top bits of a gid
+FLIPPED_HORIZONTALLY = 0x80000000
+FLIPPED_VERTICALLY = 0x40000000
+FLIPPED_DIAGONALLY = 0x20000000
+GID_MASK = 0x1FFFFFFF
+
+# Tileset and image files a map refers to, these are part of the content hash
+SOURCE_FILE = re.compile(rb"[\w./\\-]+\.(?:tsx|png|jpg|jpeg|bmp|gif)", re.IGNORECASE)
+
+# Layer options used when a caller doesn't give any, same defaults arcade.load_tilemap uses
+DEFAULT_OPTIONS = {"use_spatial_hash": None, "hit_box_algorithm": "Simple", "hit_box_detail": 4.5}
+
+
+# Raised for maps using Tiled features the cache doesn't store, those are always loaded from the map itself
+class UnsupportedLevel(Exception):
+    pass
+
+
+# A loaded level: the scene and the map sizes the game needs to place things on it
+class Level:
+    def __init__(self, map_name, scene, width, height, tile_width, tile_height):
+        self.map_name = map_name
+        self.scene = scene
+        self.width = width
+        self.height = height
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+
+
+def cache_path(map_name):
+    return str(map_name) + CACHE_EXTENSION
+
+
+# Hash of everything the cache is built from, a cache with a different hash is stale
+def content_hash(map_name, scaling=TILE_SCALING, offset=MAP_OFFSET):
+    digest = hashlib.sha1()
+    digest.update(f"{CACHE_VERSION} {sys.byteorder} {scaling} {tuple(offset)}".encode())
+
+    # Tilesets name their images relative to themselves, so each file is searched from its own folder
+    pending = [map_name]
+    seen = set()
+    while pending:
+        path = os.path.normpath(pending.pop())
+        if path in seen or not os.path.exists(path):
+            continue
+        seen.add(path)
+        with open(path, "rb") as fin:
+            data = fin.read()
+        digest.update(data)
+        if path.lower().endswith((".json", ".tmx", ".tsx")):
+            for source in sorted(set(SOURCE_FILE.findall(data)), reverse=True):
+                pending.append(os.path.join(os.path.dirname(path), source.decode()))
+    return digest.digest()
+
+
+# Turns a Tiled map (JSON or TMX) into the bytes of a level cache.
+# Sprite positions are worked out here, the same way arcade.load_tilemap places them.
+def compile_level(map_name, scaling=TILE_SCALING, offset=MAP_OFFSET):
+    tiled_map = pytiled_parser.parse_map(Path(map_name))
+    if tiled_map.orientation != "orthogonal" or tiled_map.infinite:
+        raise UnsupportedLevel(f"{map_name} is not a finite orthogonal map")
+
+    map_directory = os.path.dirname(map_name)
+    tilesets = []
+    for firstgid, tileset in sorted(tiled_map.tilesets.items()):
+        if tileset.image is None or tileset.tiles:
+            raise UnsupportedLevel(f"tileset {tileset.name} has per tile images, animations or hit boxes")
+        tilesets.append({
+            "firstgid": firstgid,
+            "image": os.path.relpath(tileset.image, map_directory or "."),
+            "columns": tileset.columns,
+            "tile_width": tileset.tile_width,
+            "tile_height": tileset.tile_height,
+            "margin": tileset.margin or 0,
+            "spacing": tileset.spacing or 0,
+            "tile_count": tileset.tile_count,
+        })
+
+    tile_width, tile_height = tiled_map.tile_size
+    map_height = tiled_map.map_size.height
+    layers = []
+    arrays = []
+    used_gids = set()
+    for layer in tiled_map.layers:
+        gids = array("I")
+        xs = array("f")
+        ys = array("f")
+        if isinstance(layer, pytiled_parser.TileLayer):
+            kind = "tiles"
+            for row_index, row in enumerate(layer.data):
+                for column_index, gid in enumerate(row):
+                    if gid == 0:
+                        continue
+                    tileset = tileset_for(tilesets, gid)
+                    gids.append(gid)
+                    xs.append(column_index * tile_width * scaling + tileset["tile_width"] * scaling / 2 + offset[0])
+                    ys.append((map_height - row_index - 1) * tile_height * scaling + tileset["tile_height"] * scaling / 2 + offset[1])
+            layer_arrays = [gids, xs, ys]
+        elif isinstance(layer, pytiled_parser.ObjectLayer):
+            kind = "objects"
+            widths = array("f")
+            heights = array("f")
+            for cur_object in layer.tiled_objects:
+                if not isinstance(cur_object, pytiled_parser.tiled_object.Tile):
+                    raise UnsupportedLevel(f"layer {layer.name} has objects that aren't tiles")
+                if cur_object.rotation:
+                    raise UnsupportedLevel(f"layer {layer.name} has rotated objects")
+                width = cur_object.size.width * scaling
+                height = cur_object.size.height * scaling
+                gids.append(cur_object.gid)
+                xs.append(cur_object.coordinates.x * scaling + offset[0] + width / 2)
+                ys.append((map_height * tile_height - cur_object.coordinates.y) * scaling + offset[1] + height / 2)
+                widths.append(width)
+                heights.append(height)
+            if not gids:
+                continue
+            layer_arrays = [gids, xs, ys, widths, heights]
+        else:
+            raise UnsupportedLevel(f"layer {layer.name} is a {type(layer).__name__}")
+
+        layers.append({
+            "name": layer.name,
+            "kind": kind,
+            "visible": layer.visible,
+            "opacity": layer.opacity,
+            "count": len(gids),
+        })
+        arrays += layer_arrays
+        used_gids.update(gids)
+
+    # Hit boxes are worked out from the tile images once here instead of on every load
+    hit_boxes = {}
+    for gid in sorted(used_gids):
+        texture = load_tile_texture(map_directory, tilesets, gid, "Simple", 4.5)
+        hit_boxes[str(gid)] = [list(point) for point in texture.hit_box_points]
+
+    meta = json.dumps({
+        "width": tiled_map.map_size.width,
+        "height": map_height,
+        "tile_width": tile_width,
+        "tile_height": tile_height,
+        "tilesets": tilesets,
+        "layers": layers,
+        "hit_boxes": hit_boxes,
+    }).encode()
+    header = HEADER.pack(CACHE_MAGIC, CACHE_VERSION, content_hash(map_name, scaling, offset), len(meta))
+    return b"".join([header, meta] + [values.tobytes() for values in arrays])
+
+
+# Compiles a map and writes its cache, returns the size of the cache in bytes
+def write_cache(map_name, scaling=TILE_SCALING, offset=MAP_OFFSET):
+    data = compile_level(map_name, scaling, offset)
+    temp_path = cache_path(map_name) + ".tmp"
+    with open(temp_path, "wb") as fout:
+        fout.write(data)
+    os.replace(temp_path, cache_path(map_name))
+    return len(data)
+
+
+# Reads a level cache with a single read, returns None if it is missing or stale
+def read_cache(map_name, scaling=TILE_SCALING, offset=MAP_OFFSET):
+    try:
+        with open(cache_path(map_name), "rb") as fin:
+            data = fin.read()
+    except OSError:
+        return None
+
+    if len(data) < HEADER.size:
+        return None
+    magic, version, digest, meta_length = HEADER.unpack_from(data)
+    if magic != CACHE_MAGIC or version != CACHE_VERSION or digest != content_hash(map_name, scaling, offset):
+        return None
+
+    position = HEADER.size
+    meta = json.loads(data[position:position + meta_length])
+    meta["hit_boxes"] = {gid: tuple(tuple(point) for point in points) for gid, points in meta["hit_boxes"].items()}
+    position += meta_length
+
+    # Slice each layer's packed arrays back out of the same buffer
+    view = memoryview(data)
+    for layer in meta["layers"]:
+        columns = [("gids", "I"), ("x", "f"), ("y", "f")]
+        if layer["kind"] == "objects":
+            columns += [("width", "f"), ("height", "f")]
+        for name, typecode in columns:
+            values = array(typecode)
+            size = layer["count"] * values.itemsize
+            values.frombytes(view[position:position + size])
+            layer[name] = values
+            position += size
+    return meta
+
+
+# Finds the tileset a gid belongs to, tilesets are sorted by their first gid
+def tileset_for(tilesets, gid):
+    tile_gid = gid & GID_MASK
+    for tileset in reversed(tilesets):
+        if tile_gid >= tileset["firstgid"]:
+            return tileset
+    raise ValueError(f"No tileset has gid {tile_gid}")
+
+
+# Creates the texture for a gid, the same texture arcade.load_tilemap would give the tile
+def load_tile_texture(map_directory, tilesets, gid, hit_box_algorithm, hit_box_detail):
+    tileset = tileset_for(tilesets, gid)
+    tile_id = (gid & GID_MASK) - tileset["firstgid"]
+    row, column = divmod(tile_id, tileset["columns"])
+    return arcade.load_texture(
+        os.path.abspath(os.path.join(map_directory, tileset["image"])),
+        tileset["margin"] + column * (tileset["tile_width"] + tileset["spacing"]),
+        tileset["margin"] + row * (tileset["tile_height"] + tileset["spacing"]),
+        tileset["tile_width"],
+        tileset["tile_height"],
+        flipped_horizontally=bool(gid & FLIPPED_HORIZONTALLY),
+        flipped_vertically=bool(gid & FLIPPED_VERTICALLY),
+        flipped_diagonally=bool(gid & FLIPPED_DIAGONALLY),
+        hit_box_algorithm=hit_box_algorithm,
+        hit_box_detail=hit_box_detail,
+    )
+
+
+# Options for a layer, the defaults with anything given for that layer on top
+def options_for(layer_name, layer_options=None):
+    options = dict(DEFAULT_OPTIONS)
+    if layer_options and layer_name in layer_options:
+        options.update(layer_options[layer_name])
+    return options
+
+
+# Builds a scene with every layer of a read cache in order and no sprites in them yet.
+# Lazy sprite lists only get their GPU buffers when they are first drawn, so the scene can be built on any thread.
+def empty_scene(meta, layer_options=None, lazy=False):
+    scene = arcade.Scene()
+    for layer in meta["layers"]:
+        sprite_list = arcade.SpriteList(use_spatial_hash=options_for(layer["name"], layer_options)["use_spatial_hash"], lazy=lazy)
+        sprite_list.visible = layer["visible"]
+        scene.add_sprite_list(layer["name"], sprite_list=sprite_list)
+    return scene
+
+
+# Creates the sprites of a cached layer at the given indices, or all of them.
+# Each distinct tile gets its texture once and is shared between sprites through the textures dict.
+# Hit boxes come from the cache, so no tile image has to be scanned.
+def build_sprites(map_name, meta, layer, options, textures, indices=None, scaling=TILE_SCALING):
+    map_directory = os.path.dirname(map_name)
+    alpha = int(layer["opacity"] * 255) if layer["opacity"] else None
+    is_object = layer["kind"] == "objects"
+    # The compiled hit boxes are for the default algorithm, any other one is worked out from the image
+    cached_hit_boxes = options["hit_box_algorithm"] == "Simple" and options["hit_box_detail"] == 4.5
+    sprites = []
+    for index in range(layer["count"]) if indices is None else indices:
+        gid = layer["gids"][index]
+        key = (gid, cached_hit_boxes, options["hit_box_algorithm"], options["hit_box_detail"])
+        texture = textures.get(key)
+        if texture is None:
+            if cached_hit_boxes:
+                texture = load_tile_texture(map_directory, meta["tilesets"], gid, "None", 4.5)
+            else:
+                texture = load_tile_texture(map_directory, meta["tilesets"], gid, *key[2:])
+            textures[key] = texture
+        sprite = arcade.Sprite(texture=texture, scale=scaling)
+        if cached_hit_boxes:
+            sprite.set_hit_box(meta["hit_boxes"][str(gid)])
+        if is_object:
+            sprite.width = layer["width"][index]
+            sprite.height = layer["height"][index]
+        sprite.position = (layer["x"][index], layer["y"][index])
+        if alpha is not None:
+            sprite.alpha = alpha
+        sprites.append(sprite)
+    return sprites
+
+
+# Builds the whole scene from a read cache
+def build_level(map_name, meta, layer_options=None, scaling=TILE_SCALING):
+    scene = empty_scene(meta, layer_options)
+    textures = {}
+    for layer in meta["layers"]:
+        sprites = build_sprites(map_name, meta, layer, options_for(layer["name"], layer_options), textures, scaling=scaling)
+        scene[layer["name"]].extend(sprites)
+
+    return Level(map_name, scene, meta["width"], meta["height"], meta["tile_width"], meta["tile_height"])
+
+
+# Loads a level from its cache, or from the map itself when the cache is missing or stale.
+# A level loaded from the map is compiled straight away so the next load can use the cache.
+def load_level(map_name, layer_options=None, scaling=TILE_SCALING, offset=MAP_OFFSET):
+    meta = read_cache(map_name, scaling, offset)
+    if meta is not None:
+        return build_level(map_name, meta, layer_options, scaling)
+
+    tile_map = arcade.load_tilemap(map_name, scaling, layer_options, None, "Simple", 4.5, offset)
+    try:
+        write_cache(map_name, scaling, offset)
+    except (UnsupportedLevel, OSError):
+        pass
+    return Level(map_name, arcade.Scene.from_tilemap(tile_map), tile_map.width, tile_map.height, tile_map.tile_width, tile_map.tile_height)
+
+
+# Compile step for the maps in assets, run with: python -m jumpit.level_cache assets/MapFinal5.JSON ...
+def main(argv=None):
+    map_names = (argv if argv is not None else sys.argv[1:]) or ["assets/MapFinal5.JSON"]
+    for map_name in map_names:
+        try:
+            size = write_cache(map_name)
+        except UnsupportedLevel as error:
+            print(f"{map_name}: not cached, {error}")
+            continue
+        print(f"{map_name}: {os.path.getsize(map_name)} bytes -> {cache_path(map_name)}: {size} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import collections
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from jumpit.constants import LEVEL_CACHE_BYTES, LEVEL_MANIFEST, MAP_NAME, PLAYER_START_X, PLAYER_START_Y
+from jumpit.simulation import build_playable
+from jumpit.streaming import read_level
+
+# Rough memory a sprite of a built level takes with its share of the level's cache, textures and spatial hashes,
+# measured with tracemalloc on the shipped maps
+SPRITE_BYTES = 3 * 1024
+
+# Bytes per pixel of a chunk's baked static layers, kept as an image and as a texture
+BAKE_BYTES_PER_PIXEL = 4
+
+
+# One entry of the level manifest, spawn is in tiles
+class LevelInfo:
+    def __init__(self, name, map_name, spawn=(PLAYER_START_X, PLAYER_START_Y)):
+        self.name = name
+        self.map_name = map_name
+        self.spawn = spawn
+
+
+# Levels in the order they are played, from a JSON manifest:
+# {"levels": [{"name": "...", "map": "MapFinal5.JSON", "spawn": [2, 1]}, ...]} with maps relative to the manifest.
+# Without a manifest the default map is the only level.
+def read_manifest(path=LEVEL_MANIFEST):
+    try:
+        with open(path) as fin:
+            data = json.load(fin)
+    except FileNotFoundError:
+        return [LevelInfo(os.path.basename(MAP_NAME), MAP_NAME)]
+    folder = os.path.dirname(path)
+    levels = []
+    for entry in data["levels"]:
+        spawn = tuple(entry.get("spawn", (PLAYER_START_X, PLAYER_START_Y)))
+        levels.append(LevelInfo(entry.get("name", entry["map"]), os.path.join(folder, entry["map"]), spawn))
+    if not levels:
+        raise ValueError(f"{path} doesn't list any levels")
+    return levels
+
+
+# Spawn point of a map in tiles as the manifest lists it, the default spawn for a map it doesn't list.
+# Paths are compared normalized, like LevelManager.index
+def find_spawn(map_name, path=LEVEL_MANIFEST):
+    wanted = os.path.normpath(map_name)
+    for info in read_manifest(path):
+        if os.path.normpath(info.map_name) == wanted:
+            return info.spawn
+    return (PLAYER_START_X, PLAYER_START_Y)
+
+
+# Rough memory a built level takes, its sprites in and around play and the bakes of the chunks in play
+def level_size(playable):
+    stream = playable.stream
+    chunks = list(stream.loaded.values()) + list(stream.built.values())
+    sprites = len(stream.walls) + sum(len(entries) for chunk in chunks for entries in chunk.layers.values())
+    bake = stream.source.chunk_width * playable.level.height * stream.tile_height * BAKE_BYTES_PER_PIXEL
+    return sprites * SPRITE_BYTES + len(stream.loaded) * bake
+
+
+# Switches between the levels of the manifest, keeping the ones played recently fully built.
+# Built levels are kept least recently played first until together they go over the memory limit, then the oldest
+# are let go. The level being played is always kept, however big it is.
+# The level after the one being played is built on a thread of its own in the meantime, so moving on to it only
+# puts the player in it. Levels whose map has no cache are loaded from the TileMap, which needs the window,
+# so those are built when they are switched to instead.
+class LevelManager:
+    def __init__(self, levels, memory_limit=LEVEL_CACHE_BYTES):
+        self.levels = levels
+        self.memory_limit = memory_limit
+
+        # Built levels by their index in the manifest, least recently played first
+        self.cache = collections.OrderedDict()
+
+        # Levels being built ahead of time, by index
+        self.pending = {}
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="level-preload")
+
+        # Switches served from the cache or a preload, and ones that had to build the level there and then
+        self.hits = 0
+        self.misses = 0
+
+    # Index of the level playing a map, a map the manifest doesn't list is added at the end.
+    # Paths are compared normalized, so a map named with Windows separators or a leading "./" is still found
+    def index(self, map_name):
+        wanted = os.path.normpath(map_name)
+        for index, info in enumerate(self.levels):
+            if os.path.normpath(info.map_name) == wanted:
+                return index
+        self.levels.append(LevelInfo(os.path.basename(map_name), map_name))
+        return len(self.levels) - 1
+
+    def next_index(self, index):
+        return (index + 1) % len(self.levels)
+
+    def build(self, index, meta=None):
+        info = self.levels[index]
+        return build_playable(info.map_name, meta, info.spawn)
+
+    # Reads and builds a level on the preload thread, returns None when only the main thread can build it
+    def build_ahead(self, index):
+        meta = read_level(self.levels[index].map_name)
+        if meta is None:
+            return None
+        return self.build(index, meta)
+
+    # Starts building a level in the background unless it is built or being built already
+    def preload(self, index):
+        if index not in self.cache and index not in self.pending:
+            self.pending[index] = self.executor.submit(self.build_ahead, index)
+
+    # A level ready for Simulation.switch_level, waiting for it if it is still being built ahead of time.
+    # meta is the level's cache if it was already read with read_level.
+    def get(self, index, meta=None):
+        playable = self.cache.pop(index, None)
+        if playable is None and index in self.pending:
+            playable = self.pending.pop(index).result()
+        if playable is None:
+            self.misses += 1
+            playable = self.build(index, meta)
+        else:
+            self.hits += 1
+        self.cache[index] = playable
+        self.evict()
+        return playable
+
+    # Memory the built levels take, counting the ones built ahead of time
+    def size(self):
+        playables = list(self.cache.values())
+        playables += [future.result() for future in self.pending.values() if future.done() and future.exception() is None]
+        return sum(level_size(playable) for playable in playables if playable is not None)
+
+    # Lets go of the least recently played levels until the rest fit in the memory limit
+    def evict(self):
+        while len(self.cache) > 1 and self.size() > self.memory_limit:
+            index, playable = self.cache.popitem(last=False)
+            playable.close()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        for playable in self.cache.values():
+            playable.close()
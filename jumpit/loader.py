@@ -0,0 +1,78 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from jumpit.constants import LOADER_THREADS
+
+# Startup milestones the window marks
+FIRST_FRAME = "first frame"
+INTERACTIVE = "interactive"
+
+
+# Loads assets on background threads so the window can show a loading screen straight away.
+# Critical assets hold back the start of the game, the others keep loading after it has started and are used once they are in.
+# Load times and startup milestones are in seconds from start, which the game sets to when the process began loading it.
+class AssetLoader:
+    def __init__(self, workers=LOADER_THREADS, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="asset-loader")
+        self.futures = {}
+        self.critical = []
+        self.load_times = {}
+        self.milestones = {}
+
+        # Optional assets that failed to load and have been reported
+        self.failed = set()
+
+    # Starts loading an asset by calling function with args on a loader thread
+    def load(self, name, function, *args, critical=True):
+        self.futures[name] = self.executor.submit(self.timed, name, function, *args)
+        if critical:
+            self.critical.append(name)
+
+    # Checks if an asset was asked for, whether or not it is in yet
+    def __contains__(self, name):
+        return name in self.futures
+
+    def timed(self, name, function, *args):
+        result = function(*args)
+        self.load_times[name] = time.perf_counter() - self.start
+        return result
+
+    # Checks if every critical asset is in, never waits
+    def ready(self):
+        return all(self.futures[name].done() for name in self.critical)
+
+    # Critical assets loaded so far and how many there are
+    def progress(self):
+        return sum(self.futures[name].done() for name in self.critical), len(self.critical)
+
+    # An asset, waiting for it if it is still loading. An error from loading it is raised here
+    def get(self, name):
+        return self.futures[name].result()
+
+    # An asset if it has finished loading, otherwise default. Also default for an asset that was never asked for.
+    # An optional asset that failed to load is reported once and then treated as missing, only critical ones raise the error
+    def result(self, name, default=None):
+        future = self.futures.get(name)
+        if future is None or not future.done() or future.cancelled():
+            return default
+        error = future.exception()
+        if error is not None and name not in self.critical:
+            if name not in self.failed:
+                self.failed.add(name)
+                print(f"{name}: not loaded, {type(error).__name__}: {error}", file=sys.stderr)
+            return default
+        return future.result()
+
+    # Records how long it took to reach a point in startup, only the first time
+    def mark(self, milestone):
+        self.milestones.setdefault(milestone, time.perf_counter() - self.start)
+
+    def report(self):
+        milestones = ", ".join(f"{name} {seconds:.3f} s" for name, seconds in self.milestones.items())
+        loads = ", ".join(f"{name} {seconds:.3f} s" for name, seconds in sorted(self.load_times.items(), key=lambda item: item[1]))
+        return f"Startup: {milestones} (loaded {loads})"
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
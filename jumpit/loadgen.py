@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import sys
+import time
+
+from jumpit.batch import POLICIES, find_policy
+from jumpit.constants import SERVER_HOST, SERVER_PORT, SIMULATION_RATE
+from jumpit.inputs import NO_INPUT
+from jumpit.profiler import percentile
+from jumpit.protocol import (
+    FLAG_RESET,
+    FLAG_SPIKE,
+    FLAG_WIN,
+    MASK_ACK,
+    MSG_STATE,
+    MSG_WELCOME,
+    WELCOME,
+    StateDecoder,
+    encode_hello,
+    encode_input,
+    read_message,
+)
+
+# Connections opened at once while the sessions start, more than the server's backlog at a time get refused
+CONNECT_BATCH = 100
+
+
+# Counts shared by every client of a load run
+class LoadStats:
+    def __init__(self):
+        # Seconds from sending keys to getting the first state with them applied
+        self.latencies = []
+        self.states = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.wins = 0
+        self.failed = 0
+        self.dropped = 0
+
+
+# One bot player: holds the keys its policy picks on every tick and reads back what the server says happened.
+# The game is played on the server, so there is no simulation to hand the policy and it is called with None.
+# The server lets go of the arrow keys when the player is sent back, so after a spike or reset they are released for a tick
+class LoadClient:
+    def __init__(self, policy, level, stats):
+        self.policy = policy
+        self.level = level
+        self.stats = stats
+        self.reader = None
+        self.writer = None
+        self.state = StateDecoder()
+        self.held = NO_INPUT
+        self.sent_back = False
+        self.sequence = 0
+
+        # When each input still waiting to be applied was sent, by sequence
+        self.sent = {}
+        self.done = False
+
+    async def connect(self, host, port):
+        try:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+            self.writer.write(encode_hello(self.level))
+            body = await read_message(self.reader)
+        except OSError:
+            body = None
+        if body is None or body[0] != MSG_WELCOME or len(body) != WELCOME.size:
+            self.stats.failed += 1
+            self.done = True
+            return False
+        return True
+
+    # Sends the keys for this tick when they changed since the last one
+    def tick(self):
+        if self.done:
+            return
+        inputs = self.policy(None)
+        if self.sent_back:
+            self.sent_back = False
+            inputs = inputs._replace(left=False, right=False)
+        if inputs == self.held:
+            return
+        self.held = inputs
+        self.sequence = (self.sequence + 1) & 0xFF
+        message = encode_input(self.sequence, inputs.to_bits())
+        self.sent[self.sequence] = time.perf_counter()
+        self.writer.write(message)
+        self.stats.bytes_out += len(message)
+
+    async def read(self):
+        stats = self.stats
+        while True:
+            body = await read_message(self.reader)
+            if body is None:
+                break
+            stats.bytes_in += len(body) + 2
+            if body[0] == MSG_STATE:
+                stats.states += 1
+                if self.state.apply(body) & MASK_ACK:
+                    sent = self.sent.pop(self.state.ack, None)
+                    if sent is not None:
+                        stats.latencies.append(time.perf_counter() - sent)
+                if self.state.events & FLAG_WIN:
+                    stats.wins += 1
+                if self.state.events & (FLAG_SPIKE | FLAG_RESET):
+                    self.sent_back = True
+        if not self.done:
+            stats.dropped += 1
+        self.done = True
+
+    def close(self):
+        self.done = True
+        if self.writer is not None:
+            self.writer.close()
+
+
+# Opens the sessions, then plays every one of them at the tick rate from a single loop for the given time
+async def run_load(host, port, sessions, duration, policy_name, level=0, seed=0, rate=SIMULATION_RATE):
+    stats = LoadStats()
+    policy = find_policy(policy_name)
+    clients = [LoadClient(policy(seed + number), level, stats) for number in range(sessions)]
+    for start in range(0, sessions, CONNECT_BATCH):
+        await asyncio.gather(*(client.connect(host, port) for client in clients[start:start + CONNECT_BATCH]))
+    readers = [asyncio.create_task(client.read()) for client in clients if not client.done]
+
+    loop = asyncio.get_running_loop()
+    step_time = 1 / rate
+    start = loop.time()
+    next_tick = start
+    while loop.time() - start < duration:
+        for client in clients:
+            client.tick()
+        next_tick += step_time
+        await asyncio.sleep(max(0.0, next_tick - loop.time()))
+    elapsed = loop.time() - start
+
+    for client in clients:
+        client.close()
+    await asyncio.gather(*readers, return_exceptions=True)
+    return stats, elapsed
+
+
+def report(stats, sessions, elapsed):
+    latencies = sorted(stats.latencies)
+    connected = sessions - stats.failed
+    lines = [
+        f"{connected} of {sessions} sessions for {elapsed:.1f} s, {stats.failed} failed to connect, {stats.dropped} dropped by the server, {stats.wins} wins",
+        f"{stats.states / elapsed:.0f} states/s, {stats.bytes_in / max(1, stats.states):.1f} bytes per state, "
+        f"{stats.bytes_in * 8 / elapsed / max(1, connected) / 1000:.2f} kbit/s down and {stats.bytes_out * 8 / elapsed / max(1, connected) / 1000:.2f} kbit/s up per session",
+    ]
+    if latencies:
+        lines.append(f"keys to state: p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+                     f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms over {len(latencies)} inputs")
+    return "\n".join(lines)
+
+
+# Loads a running server with bot sessions: python -m jumpit.loadgen --sessions 500 --duration 30
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Connect many bot players to a Jump It server and measure how it keeps up.")
+    parser.add_argument("--host", default=SERVER_HOST, help="server address")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="server port")
+    parser.add_argument("--sessions", type=int, default=100, help="bot players to connect")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to play for")
+    parser.add_argument("--policy", default="runner", help=f"policy the bots play, {', '.join(POLICIES)} or module:Class, called with None instead of a simulation")
+    parser.add_argument("--level", type=int, default=0, help="level to play, as its index in the manifest")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first bot")
+    parser.add_argument("--rate", type=int, default=SIMULATION_RATE, help="ticks per second the bots press keys at")
+    args = parser.parse_args(argv)
+
+    stats, elapsed = asyncio.run(run_load(args.host, args.port, args.sessions, args.duration, args.policy, args.level, args.seed, args.rate))
+    print(report(stats, args.sessions, elapsed))
+    return 1 if stats.failed or stats.dropped else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
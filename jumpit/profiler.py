@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+from collections import deque
+
+# How many recent samples of each phase the percentiles are worked out from
+SAMPLE_WINDOW = 600
+
+# Most phase timings kept for a trace file, older ones are dropped
+TRACE_LIMIT = 100000
+
+
+# Context manager that does nothing, handed out while profiling is off so timed code costs next to nothing
+class NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+# Times one phase of a frame and hands the time to the profiler when it ends
+class Phase:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+# Picks the value at a percentile out of a sorted list
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+# Keeps rolling timings for each phase of a frame and can write them out as a trace.
+# While it is turned off phase() returns a shared object that does nothing, so it can stay in the game loop.
+class FrameProfiler:
+    def __init__(self, enabled=False, window=SAMPLE_WINDOW, trace_limit=TRACE_LIMIT):
+        self.enabled = enabled
+        self.window = window
+        self.samples = {}
+
+        # Timings as (phase, start, duration, thread id) for the trace file
+        self.trace = deque(maxlen=trace_limit)
+
+        # Phase names in the order they were first seen, so the overlay doesn't jump around
+        self.order = []
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        return Phase(self, name)
+
+    def record(self, name, start, duration):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+            self.order.append(name)
+        samples.append(duration)
+        self.trace.append((name, start, duration, threading.get_ident()))
+
+    def toggle(self):
+        self.enabled = not self.enabled
+
+    # Returns (p50, p95, p99) in seconds for a phase
+    def percentiles(self, name):
+        values = sorted(self.samples.get(name, ()))
+        return percentile(values, 0.50), percentile(values, 0.95), percentile(values, 0.99)
+
+    # Text for the overlay, one line per phase in milliseconds
+    def summary(self):
+        lines = ["Phase\t\tp50\tp95\tp99 (ms)"]
+        for name in self.order:
+            p50, p95, p99 = self.percentiles(name)
+            lines.append(f"{name}\t\t{p50 * 1000:.2f}\t{p95 * 1000:.2f}\t{p99 * 1000:.2f}")
+        return "\n".join(lines)
+
+    # Writes the kept timings in the Chrome trace event format, which chrome://tracing and Perfetto can open
+    def dump_trace(self, path):
+        events = [
+            {"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6, "pid": 0, "tid": thread}
+            for name, start, duration, thread in list(self.trace)
+        ]
+        with open(path, "w") as fout:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fout)
+        return len(events)
+
+
+# Shared profiler that stays off, for code that is run without one
+NULL_PROFILER = FrameProfiler()
@@ -0,0 +1,129 @@
+import struct
+
+from jumpit.replay import read_varint, write_varint
+
+# Every message is the length of its body followed by the body, which starts with the message type.
+# Nothing here needs arcade, so clients can speak the protocol without the game installed.
+FRAME = struct.Struct("<H")
+
+# Client to server: the level to play as its index in the manifest, then the keys held whenever they change
+MSG_HELLO = 1
+MSG_INPUT = 2
+HELLO = struct.Struct("<BBB")
+INPUT = struct.Struct("<BBB")
+
+# Server to client: the session was started, what changed on a tick, and the leaderboard after a win
+MSG_WELCOME = 1
+MSG_STATE = 2
+MSG_SCORES = 3
+WELCOME = struct.Struct("<BIHB")
+
+# Protocol version sent in the hello, a server only talks to clients of its own version
+PROTOCOL_VERSION = 1
+
+# Parts of the state a state message has, only what changed since the last one is sent
+MASK_POSITION = 1
+MASK_SCORE = 2
+MASK_EVENTS = 4
+MASK_ACK = 8
+
+# What happened on the tick, as bits of the events byte
+FLAG_JUMP = 1
+FLAG_SPIKE = 2
+FLAG_WIN = 4
+FLAG_RESET = 8
+
+# Positions are sent in steps of 1/16 of a pixel, as the change from the last position sent.
+# Both sides add up the same rounded steps, so the client ends up exactly where the server says with no drift.
+POSITION_SCALE = 16
+
+
+def zigzag(value):
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+
+def unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def frame(body):
+    return FRAME.pack(len(body)) + body
+
+
+def encode_hello(level):
+    return frame(HELLO.pack(MSG_HELLO, PROTOCOL_VERSION, level))
+
+
+# Keys held from now on, sequence counts the inputs a client sent so it can tell when the server applied one
+def encode_input(sequence, bits):
+    return frame(INPUT.pack(MSG_INPUT, sequence & 0xFF, bits))
+
+
+def encode_welcome(session, rate, level):
+    return frame(WELCOME.pack(MSG_WELCOME, session, rate, level))
+
+
+# What changed on a tick. Positions and score are the change since the last state sent,
+# ack is the sequence of the last input applied. Only the parts in mask are written
+def encode_state(tick, mask, dx=0, dy=0, dscore=0, events=0, ack=0):
+    out = bytearray((MSG_STATE, mask))
+    write_varint(out, tick)
+    if mask & MASK_POSITION:
+        write_varint(out, zigzag(dx))
+        write_varint(out, zigzag(dy))
+    if mask & MASK_SCORE:
+        write_varint(out, zigzag(dscore))
+    if mask & MASK_EVENTS:
+        out.append(events)
+    if mask & MASK_ACK:
+        out.append(ack)
+    return frame(bytes(out))
+
+
+def encode_scores(text):
+    return frame(bytes((MSG_SCORES,)) + text.encode())
+
+
+# Rebuilds one session's state from the messages the server sends it
+class StateDecoder:
+    def __init__(self):
+        self.tick = 0
+        self.x = 0
+        self.y = 0
+        self.score = 0
+        self.events = 0
+        self.ack = None
+
+    @property
+    def position(self):
+        return self.x / POSITION_SCALE, self.y / POSITION_SCALE
+
+    # Applies a state message body, returns its mask
+    def apply(self, body):
+        mask = body[1]
+        self.tick, position = read_varint(body, 2)
+        self.events = 0
+        if mask & MASK_POSITION:
+            dx, position = read_varint(body, position)
+            dy, position = read_varint(body, position)
+            self.x += unzigzag(dx)
+            self.y += unzigzag(dy)
+        if mask & MASK_SCORE:
+            dscore, position = read_varint(body, position)
+            self.score += unzigzag(dscore)
+        if mask & MASK_EVENTS:
+            self.events = body[position]
+            position += 1
+        if mask & MASK_ACK:
+            self.ack = body[position]
+        return mask
+
+
+# Reads one message body from an asyncio stream, None once the other side has closed it
+async def read_message(reader):
+    try:
+        (length,) = FRAME.unpack(await reader.readexactly(FRAME.size))
+        return await reader.readexactly(length)
+    except (EOFError, OSError):
+        # A stream that ends part way through a message counts as closed too
+        return None
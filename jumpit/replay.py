@@ -0,0 +1,215 @@
+import argparse
+import os
+import struct
+import sys
+import time
+
+from jumpit.constants import MAP_NAME, SIMULATION_RATE
+from jumpit.inputs import InputState
+
+# Replays are a short header followed by the held keys as runs of identical ticks.
+# Each run is one varint holding the input bits in the low 4 bits and the run length above them,
+# so a long session where keys change a few times a second stays at a few bytes per second.
+REPLAY_EXTENSION = ".jir"
+REPLAY_MAGIC = b"JITR"
+REPLAY_VERSION = 1
+
+# Magic, version, simulation rate, number of ticks and length of the map name that follows
+HEADER = struct.Struct("<4sBHII")
+
+INPUT_BITS = 4
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+# Reads a varint starting at position, returns it and the position after it
+def read_varint(data, position):
+    value = 0
+    shift = 0
+    while True:
+        if position >= len(data):
+            raise ValueError("truncated replay")
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+# A recorded session: which map it was played on and the keys held on every tick
+class Replay:
+    def __init__(self, map_name=MAP_NAME, rate=SIMULATION_RATE, runs=None):
+        self.map_name = map_name
+        self.rate = rate
+
+        # Runs of ticks as [input bits, number of ticks]
+        self.runs = runs if runs is not None else []
+
+    @property
+    def ticks(self):
+        return sum(count for bits, count in self.runs)
+
+    # Input state for every tick in order
+    def inputs(self):
+        for bits, count in self.runs:
+            inputs = InputState.from_bits(bits)
+            for _ in range(count):
+                yield inputs
+
+    def to_bytes(self):
+        name = self.map_name.encode()
+        out = bytearray(HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.rate, self.ticks, len(name)))
+        out += name
+        for bits, count in self.runs:
+            write_varint(out, bits | (count << INPUT_BITS))
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size:
+            raise ValueError("truncated replay")
+        magic, version, rate, ticks, name_length = HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError("Not a Jump It replay")
+        position = HEADER.size
+        if position + name_length > len(data):
+            raise ValueError("truncated replay")
+        map_name = bytes(data[position:position + name_length]).decode()
+        position += name_length
+
+        runs = []
+        while position < len(data):
+            value, position = read_varint(data, position)
+            runs.append([value & ((1 << INPUT_BITS) - 1), value >> INPUT_BITS])
+        replay = cls(map_name, rate, runs)
+        if replay.ticks != ticks:
+            raise ValueError("Replay is cut short")
+        return replay
+
+    # Writes the replay by replacing the file, so a crash leaves either the old file or the whole replay and never half of one
+    def save(self, path):
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as fout:
+            fout.write(self.to_bytes())
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as fin:
+            return cls.from_bytes(fin.read())
+
+
+# Builds a replay one tick at a time while a game is being played
+class ReplayRecorder:
+    def __init__(self, map_name=MAP_NAME, rate=SIMULATION_RATE):
+        self.replay = Replay(map_name, rate)
+
+    def record(self, inputs):
+        bits = inputs.to_bits()
+        runs = self.replay.runs
+        if runs and runs[-1][0] == bits:
+            runs[-1][1] += 1
+        else:
+            runs.append([bits, 1])
+
+
+# What happened during a replay
+class ReplayResult:
+    def __init__(self):
+        self.ticks = 0
+        self.score = None
+        self.wins = []
+        self.spikes_hit = 0
+        self.deaths = []
+
+
+# Plays a replay on a simulation without drawing anything.
+# As fast as the CPU allows by default, or at the rate it was recorded at when realtime is set.
+# A simulation given for the same map is started over instead of loading the map again.
+def play(replay, sim=None, realtime=False):
+    # Imported here so the replay format can be read without arcade
+    from jumpit.simulation import Simulation, EVENT_SPIKE, EVENT_WIN
+
+    if sim is None or sim.map_name != replay.map_name:
+        sim = Simulation(replay.map_name)
+        sim.setup()
+    else:
+        sim.new_game()
+
+    result = ReplayResult()
+    tick_time = 1 / replay.rate
+    next_tick = time.perf_counter()
+    for inputs in replay.inputs():
+        if realtime:
+            next_tick += tick_time
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        for event, data in sim.step(inputs, tick_time):
+            if event == EVENT_SPIKE:
+                result.spikes_hit += 1
+                result.deaths.append((sim.tick_count, data))
+            elif event == EVENT_WIN:
+                result.wins.append((sim.tick_count, data))
+    result.ticks = sim.tick_count
+    result.score = sim.score
+    return result
+
+
+# A new file in the folder for a session of a map, named by the time and the map, with a number added when a session
+# of the same map was saved in the same second. The file is created here so no two sessions can be given the same one.
+def claim_session_path(folder, map_name, extension):
+    os.makedirs(folder, exist_ok=True)
+    stem = time.strftime("%Y%m%d-%H%M%S") + "-" + os.path.splitext(os.path.basename(map_name))[0]
+    number = 1
+    while True:
+        path = os.path.join(folder, stem + (f"-{number}" if number > 1 else "") + extension)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            number += 1
+
+
+# Where the window saves each session when recording is on
+def new_replay_path(folder, map_name=MAP_NAME):
+    return claim_session_path(folder, map_name, REPLAY_EXTENSION)
+
+
+# Re-simulates replays as fast as possible: python -m jumpit.replay replays/*.jir
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play back Jump It replays without a window.")
+    parser.add_argument("replays", nargs="+", help="replay files to play")
+    parser.add_argument("--realtime", action="store_true", help="play at the recorded rate instead of as fast as possible")
+    args = parser.parse_args(argv)
+
+    from jumpit.simulation import Simulation
+
+    # One simulation per map, loaded once and started over for each replay
+    sims = {}
+    total_ticks = 0
+    start = time.perf_counter()
+    for path in args.replays:
+        replay = Replay.load(path)
+        if replay.map_name not in sims:
+            sims[replay.map_name] = Simulation(replay.map_name)
+            sims[replay.map_name].setup()
+        result = play(replay, sims[replay.map_name], args.realtime)
+        total_ticks += result.ticks
+        wins = ", ".join(str(score) for tick, score in result.wins) or "none"
+        print(f"{path}: {result.ticks} ticks, {result.spikes_hit} spikes hit, wins: {wins}, final score {result.score}")
+    elapsed = time.perf_counter() - start
+    print(f"{len(args.replays)} replays, {total_ticks} ticks in {elapsed:.2f} s ({total_ticks / max(elapsed, 1e-9):.0f} ticks/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
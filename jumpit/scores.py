@@ -0,0 +1,336 @@
+import bisect
+import datetime
+import json
+import os
+import queue
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no fcntl, files are locked through msvcrt there
+    fcntl = None
+    import msvcrt
+
+# Where the score history and its index are kept
+SCORE_FILE = "assets/HighScores.txt"
+INDEX_FILE = "assets/HighScores.idx"
+INDEX_VERSION = 1
+
+# How many scores are shown on the win screen
+TOP_COUNT = 10
+
+
+# Creates the string for a score in the same "score  |  date" format the file has always used
+def format_row(score, date):
+    number = str(score)
+    if len(number) < 4:
+        return number + "\t\t|\t" + str(date) + "\n"
+    return number + "\t|\t" + str(date) + "\n"
+
+
+# Reads the score back out of a row, returns None for lines that aren't scores.
+# A row cut off by a crash before its date only counts once its score and the separator after it are whole.
+def parse_score(row):
+    number, separator, date = row.partition("|")
+    if not separator or not date.strip():
+        return None
+    try:
+        return int(number.split("\t", 1)[0])
+    except ValueError:
+        return None
+
+
+# Writes a file by replacing it, so a crash leaves either the old or the new version and never half of one
+def atomic_write(path, data):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as fout:
+        fout.write(data)
+        fout.flush()
+        os.fsync(fout.fileno())
+    os.replace(temp_path, path)
+
+
+# Generates the string the win screen shows, top ten with the new score marked by double astericks and its rank below
+def leaderboard_text(top, new_seq, new_row, rank, total):
+    returnStr = "Score\t|\t\tDate\n"
+    returnStr += "----------------------------------\n"
+    found = False
+    for score, seq, row in top[:TOP_COUNT]:
+        if seq == new_seq:
+            # Scores with 3 or less characters (including negative sign) lose a tab to make room for the astericks
+            newString = row if len(str(score)) >= 4 else row.replace("\t", "", 1)
+            returnStr += "**" + newString.replace("\n", "") + "**\n"
+            found = True
+        else:
+            returnStr += row
+
+    # If the new score is not in top ten, place it below the list with an empty line
+    if not found:
+        returnStr += "\n" + new_row
+    returnStr += "Rank " + str(rank) + " of " + str(total) + "\n"
+    return returnStr
+
+
+# Counts at positions 0 to size - 1 with the sum of the ones before any position in log(size) steps (a Fenwick tree)
+class CountTree:
+    def __init__(self, counts):
+        # Each node holds the sum of the counts in the range it covers, built bottom up in one pass
+        self.tree = [0] + list(counts)
+        for node in range(1, len(self.tree)):
+            parent = node + (node & -node)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[node]
+
+    def add(self, position, amount):
+        node = position + 1
+        while node < len(self.tree):
+            self.tree[node] += amount
+            node += node & -node
+
+    # Sum of the counts at the positions before this one
+    def prefix(self, position):
+        total = 0
+        while position > 0:
+            total += self.tree[position]
+            position -= position & -position
+        return total
+
+
+# Holds an exclusive lock on a lock file beside the score history for as long as the with block runs,
+# so the game and a server can both write to the same history without losing or doubling rows
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+        return False
+
+
+# Score history that is only ever appended to, with a small index kept beside it.
+# The index holds the best scores and how many times each score has been reached, so adding a
+# score and finding its rank never needs to read the history again. The counts are kept in a CountTree
+# over the distinct scores, so a rank takes log(distinct scores) steps and so does counting a score seen before.
+class ScoreStore:
+    def __init__(self, path=SCORE_FILE, index_path=INDEX_FILE, keep=TOP_COUNT):
+        self.path = path
+        self.index_path = index_path
+        self.keep = keep
+        self.lock = FileLock(path + ".lock")
+
+        # Number of bytes of the history the index covers, and number of rows in it
+        self.offset = 0
+        self.rows = 0
+
+        # Best rows as (score, row number, row) sorted best first, older rows win ties
+        self.top = []
+
+        # Distinct scores in ascending order, how many rows have each one, and the same counts in that order as a tree
+        self.values = []
+        self.counts = {}
+        self.tree = CountTree([])
+
+        self.load()
+
+    def load(self):
+        with self.lock:
+            self.load_locked()
+
+    def load_locked(self):
+        if not os.path.exists(self.path):
+            open(self.path, "a").close()
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as fin:
+                index = json.load(fin)
+            if index.get("version") == INDEX_VERSION and index["offset"] <= os.path.getsize(self.path):
+                self.offset = index["offset"]
+                self.rows = index["rows"]
+                self.top = [tuple(entry) for entry in index["top"]]
+                self.counts = {int(score): count for score, count in index["counts"].items()}
+                self.values = sorted(self.counts)
+                self.tree = CountTree(self.counts[value] for value in self.values)
+
+        # Pick up any rows written after the index was saved, for a missing index this
+        # is the one time migration that reads the whole existing file
+        if self.offset < os.path.getsize(self.path):
+            self.catch_up()
+            self.write_index()
+
+    def catch_up(self):
+        with open(self.path, "rb") as fin:
+            fin.seek(self.offset)
+            data = fin.read()
+
+        # Only whole rows are counted, a row without its newline is either still being written or was cut off by a crash.
+        # It is left in the file and picked up here once a newline ends it
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode().splitlines(keepends=True):
+            score = parse_score(line)
+            if score is not None:
+                self.count(score, line)
+        self.offset += end
+
+    # Saves the index, other writers may be saving theirs so the lock is held while the file is replaced
+    def save_index(self):
+        with self.lock:
+            self.write_index()
+
+    def write_index(self):
+        index = {
+            "version": INDEX_VERSION,
+            "offset": self.offset,
+            "rows": self.rows,
+            "top": self.top,
+            "counts": {str(score): count for score, count in self.counts.items()},
+        }
+        atomic_write(self.index_path, json.dumps(index))
+
+    # Adds a row to the in memory index, returns its row number
+    def count(self, score, row):
+        seq = self.rows
+        self.rows += 1
+
+        # A score not seen before moves the positions of the ones above it, so the tree is built again
+        if score not in self.counts:
+            bisect.insort(self.values, score)
+            self.counts[score] = 1
+            self.tree = CountTree(self.counts[value] for value in self.values)
+        else:
+            self.counts[score] += 1
+            self.tree.add(bisect.bisect_left(self.values, score), 1)
+
+        # Keep the best rows, sorting on negative score puts the highest first
+        if len(self.top) < self.keep or score > self.top[-1][0]:
+            keys = [(-entry[0], entry[1]) for entry in self.top]
+            self.top.insert(bisect.bisect(keys, (-score, seq)), (score, seq, row))
+            del self.top[self.keep:]
+        return seq
+
+    # Position of the newest row with this score in the sorted history, older rows with the same score come first.
+    # For a row that was just counted that is its own position
+    def rank(self, score):
+        higher = self.rows - self.tree.prefix(bisect.bisect_right(self.values, score))
+        return higher + self.counts.get(score, 0)
+
+    # Appends rows to the history without saving the index, returns (row number, row, rank when it was added) for each
+    def append(self, scores, date=None):
+        if date is None:
+            date = datetime.date.today()
+        rows = [format_row(score, date) for score in scores]
+        data = "".join(rows).encode()
+        with self.lock:
+            # Rows other writers added since this store last looked are counted first, so the new ones go after them
+            self.catch_up()
+            with open(self.path, "ab") as fout:
+                # Anything past the rows counted is a row cut off by a crash, it is ended so the new rows start on a line of their own
+                if fout.tell() > self.offset:
+                    fout.write(b"\n")
+                    fout.flush()
+                    self.catch_up()
+                fout.write(data)
+                fout.flush()
+                os.fsync(fout.fileno())
+                end = fout.tell()
+            added = []
+            for score, row in zip(scores, rows):
+                added.append((self.count(score, row), row, self.rank(score)))
+            self.offset = end
+        return added
+
+    # Stores a new score, returns the row written and its rank
+    def add(self, score, date=None):
+        seq, row, rank = self.append([score], date)[0]
+        self.save_index()
+        return seq, row, rank
+
+    # Takes in the new score, outputs the string containing the top ten scores, the new score and its rank
+    def high_score(self, score):
+        seq, row, rank = self.add(score)
+        return leaderboard_text(self.top, seq, row, rank, self.rows)
+
+
+# Saves scores on a background thread so a win never waits on the disk.
+# Scores sent while a save is running are written together in the next batch, and the
+# leaderboard text for each one is handed back through poll() once its batch is saved.
+class ScoreWriter:
+    def __init__(self, path=SCORE_FILE, index_path=INDEX_FILE):
+        self.path = path
+        self.index_path = index_path
+        self.store = None
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.next_ticket = 0
+        self.thread = threading.Thread(target=self.run, name="ScoreWriter", daemon=True)
+        self.thread.start()
+
+    # Queues a score to be saved, returns a ticket that poll() hands back with its leaderboard text
+    def submit(self, score, date=None):
+        ticket = self.next_ticket
+        self.next_ticket += 1
+        self.requests.put((ticket, score, date))
+        return ticket
+
+    # Returns every (ticket, leaderboard text) that is ready, never waits
+    def poll(self):
+        ready = []
+        while True:
+            try:
+                ready.append(self.results.get_nowait())
+            except queue.Empty:
+                return ready
+
+    # Saves anything still queued and stops the thread
+    def close(self, timeout=None):
+        self.requests.put(None)
+        self.thread.join(timeout)
+
+    def run(self):
+        # Opening the store can mean migrating a large file, so it happens here and not in the game
+        self.store = ScoreStore(self.path, self.index_path)
+        running = True
+        while running:
+            batch = [self.requests.get()]
+            while True:
+                try:
+                    batch.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [request for request in batch if request is not None]
+            if not batch:
+                continue
+
+            # Scores from different days can't share a date, so they are appended one date at a time
+            saved = []
+            for ticket, score, date in batch:
+                if saved and saved[-1][0] == date:
+                    saved[-1][1].append(ticket)
+                    saved[-1][2].append(score)
+                else:
+                    saved.append((date, [ticket], [score]))
+            written = []
+            for date, tickets, scores in saved:
+                written += zip(tickets, scores, self.store.append(scores, date))
+            self.store.save_index()
+
+            for ticket, score, (seq, row, rank) in written:
+                self.results.put((ticket, leaderboard_text(self.store.top, seq, row, rank, self.store.rows)))
@@ -0,0 +1,316 @@
+import argparse
+import asyncio
+import collections
+import sys
+import time
+
+from jumpit.animation import AnimationScheduler
+from jumpit.constants import MAX_CATCH_UP_STEPS, SERVER_HOST, SERVER_PORT, SIMULATION_RATE
+from jumpit.inputs import InputState, NO_INPUT
+from jumpit.levels import read_manifest
+from jumpit.profiler import FrameProfiler
+from jumpit.protocol import (
+    FLAG_JUMP,
+    FLAG_RESET,
+    FLAG_SPIKE,
+    FLAG_WIN,
+    HELLO,
+    INPUT,
+    MASK_ACK,
+    MASK_EVENTS,
+    MASK_POSITION,
+    MASK_SCORE,
+    MSG_HELLO,
+    MSG_INPUT,
+    POSITION_SCALE,
+    PROTOCOL_VERSION,
+    encode_scores,
+    encode_state,
+    encode_welcome,
+    read_message,
+)
+from jumpit.scores import ScoreWriter
+from jumpit.simulation import EVENT_JUMP, EVENT_RESET, EVENT_SPIKE, EVENT_WIN, PlayableLevel, Simulation, build_playable
+from jumpit.streaming import drop_sprite
+
+# Inputs a session can have waiting, one is applied per tick, anything past this is dropped oldest first
+MAX_INPUT_BACKLOG = 8
+
+# Bytes a client can leave unread before its session is closed, its state can't be skipped without it going out of sync
+MAX_SEND_BUFFER = 64 * 1024
+
+# Score history of remote players, kept apart from the one the game window saves to
+SERVER_SCORE_FILE = "assets/ServerScores.txt"
+SERVER_INDEX_FILE = "assets/ServerScores.idx"
+
+# How often the server prints its session count and tick timings, in seconds
+STATS_INTERVAL = 5.0
+
+
+# One session's side of a level shared by every session playing it.
+# The walls and triggers belong to the shared level and are never changed, the spikes and duck this session has set off
+# are kept here and skipped. Stands in for a Simulation's level stream and trigger grid, the whole level is always in play.
+class SessionTriggers:
+    def __init__(self, stream):
+        self.walls = stream.walls
+        self.grid = stream.triggers
+        self.triggers = self
+        self.removed = set()
+
+    def update(self, x):
+        pass
+
+    def remove(self, sprite):
+        self.removed.add(sprite)
+
+    def reset(self):
+        self.removed.clear()
+
+    def hits(self, player):
+        return [(sprite, kind) for sprite, kind in self.grid.hits(player) if sprite not in self.removed]
+
+    def close(self):
+        pass
+
+
+# A player connected to the server and the simulation of their game
+class Session:
+    def __init__(self, number, level, sim, writer):
+        self.number = number
+        self.level = level
+        self.sim = sim
+        self.writer = writer
+
+        # Keys sent by the client as (sequence, input state), waiting for their tick
+        self.inputs = collections.deque(maxlen=MAX_INPUT_BACKLOG)
+        self.held = NO_INPUT
+        self.ack = 0
+
+        # State last sent, positions in steps of 1/POSITION_SCALE pixels, nothing has been sent yet
+        self.sent_x = 0
+        self.sent_y = 0
+        self.sent_score = 0
+        self.sent_ack = None
+
+        self.closed = False
+
+
+# Runs the game rules for every connected session in one process.
+# Sessions on the same level share one copy of it, fully loaded, with its walls and triggers.
+# Each session only has its own player, physics engine and the spikes it set off, so a session costs a few kilobytes.
+# Every tick steps all sessions one after another, then sends each one what changed since its last message.
+# Wins from every session are saved through one ScoreWriter, so the score history has one writer however many play.
+class GameServer:
+    def __init__(self, levels, rate=SIMULATION_RATE, score_writer=None):
+        self.levels = levels
+        self.rate = rate
+        self.step_time = 1 / rate
+        self.score_writer = score_writer or ScoreWriter(SERVER_SCORE_FILE, SERVER_INDEX_FILE)
+
+        # Shared levels by index in the manifest, built the first time a session asks for one
+        self.shared = {}
+
+        self.sessions = {}
+        self.next_session = 0
+
+        # Session waiting for the leaderboard of each score saved, by ticket
+        self.tickets = {}
+
+        self.tick_count = 0
+
+        # Tick timings: stepping every session, sending the changes, the whole tick and how late it started
+        self.profiler = FrameProfiler(True)
+
+    def shared_level(self, index):
+        playable = self.shared.get(index)
+        if playable is None:
+            info = self.levels[index]
+            playable = build_playable(info.map_name, None, info.spawn)
+            playable.stream.load_all()
+            self.shared[index] = playable
+        return playable
+
+    def open_session(self, level, writer):
+        shared = self.shared_level(level)
+        view = PlayableLevel(shared.map_name, shared.level, SessionTriggers(shared.stream), AnimationScheduler(), shared.spawn)
+        sim = Simulation(shared.map_name)
+        sim.enter(view)
+        session = Session(self.next_session, level, sim, writer)
+        self.sessions[session.number] = session
+        self.next_session += 1
+        return session
+
+    def close_session(self, session):
+        if session.closed:
+            return
+        session.closed = True
+        self.sessions.pop(session.number, None)
+        drop_sprite(session.sim.player_sprite)
+        session.writer.close()
+
+    # Queues the keys a client holds from its next tick on
+    def receive_input(self, session, sequence, bits):
+        session.inputs.append((sequence, InputState.from_bits(bits)))
+
+    # Steps every session once and sends each one what changed
+    def tick(self):
+        self.tick_count += 1
+        step_time = self.step_time
+        stepped = []
+        with self.profiler.phase("step"):
+            for session in list(self.sessions.values()):
+                if session.inputs:
+                    session.ack, session.held = session.inputs.popleft()
+                stepped.append((session, session.sim.step(session.held, step_time)))
+
+        with self.profiler.phase("send"):
+            for session, events in stepped:
+                self.send_state(session, events)
+            for ticket, text in self.score_writer.poll():
+                session = self.tickets.pop(ticket, None)
+                if session is not None and not session.closed:
+                    session.writer.write(encode_scores(text))
+
+    def send_state(self, session, events):
+        sim = session.sim
+        player = sim.player_sprite
+        x = round(player.center_x * POSITION_SCALE)
+        y = round(player.center_y * POSITION_SCALE)
+        mask = 0
+        flags = 0
+        if x != session.sent_x or y != session.sent_y:
+            mask |= MASK_POSITION
+        if sim.score != session.sent_score:
+            mask |= MASK_SCORE
+        if session.ack != session.sent_ack:
+            mask |= MASK_ACK
+        for event, data in events:
+            if event == EVENT_JUMP:
+                flags |= FLAG_JUMP
+            elif event == EVENT_SPIKE:
+                flags |= FLAG_SPIKE
+            elif event == EVENT_RESET:
+                flags |= FLAG_RESET
+            elif event == EVENT_WIN:
+                flags |= FLAG_WIN
+                self.tickets[self.score_writer.submit(data)] = session
+        if flags:
+            mask |= MASK_EVENTS
+        if not mask:
+            # Nothing changed since the last state, so nothing is sent
+            return
+        if session.writer.is_closing():
+            self.close_session(session)
+            return
+
+        session.writer.write(encode_state(self.tick_count, mask, x - session.sent_x, y - session.sent_y, sim.score - session.sent_score, flags, session.ack))
+        session.sent_x = x
+        session.sent_y = y
+        session.sent_score = sim.score
+        session.sent_ack = session.ack
+        if session.writer.transport.get_write_buffer_size() > MAX_SEND_BUFFER:
+            self.close_session(session)
+
+    # Serves one client: a hello starts its session, after that every message is the keys it holds
+    async def handle(self, reader, writer):
+        body = await read_message(reader)
+        if body is None or len(body) != HELLO.size or body[0] != MSG_HELLO:
+            writer.close()
+            return
+        kind, version, level = HELLO.unpack(body)
+        if version != PROTOCOL_VERSION or level >= len(self.levels):
+            writer.close()
+            return
+
+        session = self.open_session(level, writer)
+        writer.write(encode_welcome(session.number, self.rate, level))
+        try:
+            while not session.closed:
+                body = await read_message(reader)
+                if body is None:
+                    break
+                if len(body) == INPUT.size and body[0] == MSG_INPUT:
+                    kind, sequence, bits = INPUT.unpack(body)
+                    self.receive_input(session, sequence, bits)
+        finally:
+            self.close_session(session)
+
+    # Ticks at the fixed rate for as long as the server runs. A tick that starts late is still run,
+    # once the server is more than MAX_CATCH_UP_STEPS behind the lost ticks are skipped, the same as the window does
+    async def run_ticks(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            # Always gives the connections a turn, even a server that is behind has to read inputs and notice closed sessions
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            start = time.perf_counter()
+            self.profiler.record("late", start, max(0.0, loop.time() - next_tick))
+            self.tick()
+            duration = time.perf_counter() - start
+            self.profiler.record("tick", start, duration)
+            if self.sessions:
+                self.profiler.record("session", start, duration / len(self.sessions))
+            next_tick += self.step_time
+            if loop.time() - next_tick > self.step_time * MAX_CATCH_UP_STEPS:
+                next_tick = loop.time()
+
+    # Tick timings so far, and how many sessions a core could tick in time going by what each one costs now
+    def stats(self):
+        step, send, tick, late, session = (self.profiler.percentiles(name) for name in ("step", "send", "tick", "late", "session"))
+        per_core = int(self.step_time / session[0]) if session[0] else 0
+        return (f"{len(self.sessions)} sessions, tick p50 {tick[0] * 1000:.2f} ms p99 {tick[2] * 1000:.2f} ms "
+                f"(step {step[0] * 1000:.2f} ms, send {send[0] * 1000:.2f} ms), late p99 {late[2] * 1000:.2f} ms, "
+                f"{session[0] * 1e6:.1f} us per session tick, about {per_core} sessions per core at {self.rate} Hz")
+
+    async def report(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            print(self.stats(), file=sys.stderr)
+
+    def close(self):
+        for session in list(self.sessions.values()):
+            self.close_session(session)
+        self.score_writer.close()
+        for playable in self.shared.values():
+            playable.close()
+
+
+async def serve(server, host, port, duration=None, interval=STATS_INTERVAL):
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f"Serving {len(server.levels)} levels on {host}:{port} at {server.rate} ticks/s", file=sys.stderr)
+    tasks = [asyncio.create_task(server.run_ticks()), asyncio.create_task(server.report(interval))]
+    try:
+        async with listener:
+            if duration is None:
+                await listener.serve_forever()
+            else:
+                await asyncio.sleep(duration)
+    finally:
+        for task in tasks:
+            task.cancel()
+        print(server.stats(), file=sys.stderr)
+
+
+# Hosts many sessions at once for remote play: python -m jumpit.server --port 7777
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Jump It sessions for remote players, stepping them all on fixed ticks.")
+    parser.add_argument("--host", default=SERVER_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="port to listen on")
+    parser.add_argument("--rate", type=int, default=SIMULATION_RATE, help="ticks per second")
+    parser.add_argument("--scores", default=SERVER_SCORE_FILE, help="score history every session's wins are saved to")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds, runs until stopped by default")
+    parser.add_argument("--stats", type=float, default=STATS_INTERVAL, help="seconds between timing reports")
+    args = parser.parse_args(argv)
+
+    index_path = SERVER_INDEX_FILE if args.scores == SERVER_SCORE_FILE else args.scores + ".idx"
+    server = GameServer(read_manifest(), args.rate, ScoreWriter(args.scores, index_path))
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.duration, args.stats))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import arcade
+
+from jumpit.constants import (
+    GRAVITY,
+    RIGHT_FACING,
+    LAYER_NAME_DUCK,
+    LAYER_NAME_PLATFORMS,
+    LAYER_NAME_PLAYER,
+    LAYER_NAME_SPIKE,
+    MAP_NAME,
+    MAP_OFFSET,
+    PLAYER_JUMP_SPEED,
+    PLAYER_MOVEMENT_SPEED,
+    PLAYER_START_X,
+    PLAYER_START_Y,
+    SPIKE_PENALTY,
+    START_SCORE,
+    TILE_SCALING,
+)
+from jumpit.animation import AnimationScheduler
+from jumpit.entities import PlayerCharacter
+from jumpit.inputs import NO_INPUT
+from jumpit.profiler import NULL_PROFILER
+from jumpit.streaming import LevelStream, open_level
+from jumpit.triggers import KIND_GOAL, KIND_HAZARD
+
+# Events the simulation reports back from a tick, the window turns these into sounds and text
+EVENT_JUMP = "jump"
+EVENT_SPIKE = "spike"
+EVENT_WIN = "win"
+EVENT_RESET = "reset"
+
+# Layers the player sets off by touching them, and what touching them does
+TRIGGER_LAYERS = {
+    LAYER_NAME_SPIKE: KIND_HAZARD,
+    LAYER_NAME_DUCK: KIND_GOAL,
+}
+
+# Layer Options for the Tilemap, using true for every object that doesn't move
+LAYER_OPTIONS = {
+    LAYER_NAME_PLATFORMS: {
+        "use_spatial_hash": True,
+    },
+    LAYER_NAME_SPIKE: {
+        "use_spatial_hash": True,
+    },
+    LAYER_NAME_DUCK: {
+        "use_spatial_hash": True,
+    },
+}
+
+
+# A level ready to be played: its scene and spatial hashes, the chunks around the spawn point in play with their walls
+# and triggers, the level's animated tiles and where the player starts
+class PlayableLevel:
+    def __init__(self, map_name, level, stream, animations, spawn):
+        self.map_name = map_name
+        self.level = level
+        self.stream = stream
+        self.animations = animations
+        self.spawn = spawn
+
+    def close(self):
+        self.stream.close()
+
+
+# Builds a level up to the point the player can be put in it, spawn is in tiles.
+# Opening the level from its compiled cache, or the TileMap when the cache is out of date, its layers start out empty.
+# The chunks around the spawn point are loaded, platform tiles are merged into larger invisible walls as each chunk loads.
+# A level opened from its cache doesn't need the window, so it can be built on another thread.
+def build_playable(map_name, meta=None, spawn=(PLAYER_START_X, PLAYER_START_Y)):
+    level, source = open_level(map_name, LAYER_OPTIONS, TILE_SCALING, MAP_OFFSET, meta)
+    spawn_point = (level.tile_width * TILE_SCALING * spawn[0], level.tile_height * TILE_SCALING * spawn[1])
+    animations = AnimationScheduler()
+    stream = LevelStream(level, source, animations, TRIGGER_LAYERS, LAYER_NAME_PLATFORMS, TILE_SCALING)
+    stream.pin(spawn_point[0])
+    stream.update(spawn_point[0])
+    return PlayableLevel(map_name, level, stream, animations, spawn_point)
+
+
+# Runs the rules of the game without a window: player, physics, spikes, duck and score.
+# Nothing here draws or plays sounds, so it can be stepped as fast as the CPU allows.
+class Simulation:
+    def __init__(self, map_name=MAP_NAME, profiler=NULL_PROFILER):
+        self.map_name = map_name
+
+        # Times the phases of each tick when it is turned on
+        self.profiler = profiler
+
+        # Initialize the key state the rules act on, same as the keys tracked by the window
+        self.left_pressed = False
+        self.right_pressed = False
+        self.up_pressed = False
+        self.jump_needs_reset = False
+        self.reset_pressed = False
+
+        # Input state from the previous tick, changes are treated as key presses and releases
+        self.last_input = NO_INPUT
+
+        # Level being played with its stream of chunks and spawn point
+        self.playable = None
+        self.level = None
+        self.scene = None
+        self.player_sprite = None
+        self.walls = None
+        self.physics_engine = None
+
+        # Only the sprites with an animation are advanced each tick, the player here and the level's tiles with the level
+        self.animations = AnimationScheduler()
+
+        # Spikes and duck in play indexed by grid cell
+        self.triggers = None
+
+        # Chunks of the level in play around the player, loaded and let go of as the player moves
+        self.stream = None
+
+        self.score = START_SCORE
+        self.won = False
+        self.tick_count = 0
+
+        # Events from the last tick as tuples of (event, data)
+        self.events = []
+
+    # Loads the level, meta is the level's cache if it was already read with read_level.
+    # The player spawns where the level manifest says for the map, so replays, bots and the solver start where the game does
+    def setup(self, meta=None):
+        from jumpit.levels import find_spawn
+
+        if self.stream is not None:
+            self.stream.close()
+
+        # Set up the player, it is placed at the spawn point of the level it enters
+        self.player_sprite = PlayerCharacter()
+        self.enter(build_playable(self.map_name, meta, find_spawn(self.map_name)))
+
+    # Puts the player into a built level at its spawn point. The level it leaves is left as it is, to be entered again later
+    def enter(self, playable):
+        if self.player_sprite is None:
+            self.player_sprite = PlayerCharacter()
+        player = self.player_sprite
+        player.remove_from_sprite_lists()
+        self.playable = playable
+        self.map_name = playable.map_name
+        self.level = playable.level
+        self.scene = self.level.scene
+        self.stream = playable.stream
+        self.walls = self.stream.walls
+        self.triggers = self.stream.triggers
+
+        # Placing the player at the spawn point, the player layer is made the first time a level is entered
+        player.center_x, player.center_y = self.spawn_point()
+        if LAYER_NAME_PLAYER not in self.scene.name_mapping:
+            self.scene.add_sprite_list(LAYER_NAME_PLAYER, sprite_list=arcade.SpriteList(lazy=True))
+        self.scene[LAYER_NAME_PLAYER].append(player)
+
+        # The player animates before the level's animated tiles
+        self.animations.clear()
+        self.animations.register(player)
+
+        # Creating the physics engine
+        self.physics_engine = arcade.PhysicsEnginePlatformer(
+            player,
+            gravity_constant=GRAVITY,
+            walls=self.walls
+        )
+
+        self.won = False
+
+    # Moves on to another built level and starts a new game on it, anything set off when it was last played is put back
+    def switch_level(self, playable):
+        self.enter(playable)
+        self.new_game()
+
+    def spawn_point(self):
+        return self.playable.spawn
+
+    def restart(self):
+        # Reseting player locaton to spawn point, resetting x and y speed to 0, and turning off key presses so you don't keep moving on respawn until you release and press again
+        self.player_sprite.change_x = 0
+        self.player_sprite.change_y = 0
+        self.jump_needs_reset = False
+        self.right_pressed = False
+        self.left_pressed = False
+        self.player_sprite.center_x, self.player_sprite.center_y = self.spawn_point()
+
+    # Same as pressing R, puts the spikes, duck and score back to the start of a game.
+    # Removed sprites in play are added back to the lists they came from, nothing is loaded again.
+    def reset(self):
+        self.stream.reset()
+        self.restart()
+        self.player_sprite.facing_direction = RIGHT_FACING
+        self.player_sprite.texture = self.player_sprite.idle_texture_pair[RIGHT_FACING]
+        self.physics_engine.jumps_since_ground = 0
+        self.score = START_SCORE
+        self.won = False
+
+    # Puts the simulation back to how it was right after setup(), for playing another run on the same level
+    def new_game(self):
+        self.reset()
+        self.up_pressed = False
+        self.reset_pressed = False
+        self.last_input = NO_INPUT
+        self.tick_count = 0
+        self.events = []
+
+    # Applies a change in held keys the way on_key_press and on_key_release do in the window
+    def apply_input(self, inputs):
+        last = self.last_input
+        self.last_input = inputs
+        if inputs == last:
+            return
+
+        # Keys that were released since the last tick
+        if last.up and not inputs.up:
+            self.up_pressed = False
+            self.jump_needs_reset = False
+        if last.left and not inputs.left:
+            self.left_pressed = False
+        if last.right and not inputs.right:
+            self.right_pressed = False
+        if last.reset and not inputs.reset:
+            self.reset_pressed = False
+
+        # Keys that were pressed since the last tick
+        if inputs.up and not last.up:
+            self.up_pressed = True
+        if inputs.left and not last.left:
+            self.left_pressed = True
+        if inputs.right and not last.right:
+            self.right_pressed = True
+        if inputs.reset and not last.reset:
+            self.reset_pressed = True
+            self.reset()
+            self.events.append((EVENT_RESET, None))
+
+        self.process_keychange()
+
+    def process_keychange(self):
+        # Process up
+        if self.up_pressed:
+            if (self.physics_engine.can_jump(y_distance=10) and not self.jump_needs_reset):
+                self.player_sprite.change_y = PLAYER_JUMP_SPEED
+                self.jump_needs_reset = True
+                self.events.append((EVENT_JUMP, None))
+
+        # Process left/right
+        if self.right_pressed and not self.left_pressed:
+            self.player_sprite.change_x = PLAYER_MOVEMENT_SPEED
+        elif self.left_pressed and not self.right_pressed:
+            self.player_sprite.change_x = -PLAYER_MOVEMENT_SPEED
+        else:
+            self.player_sprite.change_x = 0
+
+        #Process reset
+        if self.reset_pressed:
+            self.player_sprite.change_x = 0
+            self.player_sprite.change_y = 0
+
+    # Takes a spike or duck the player touched out of the level until the next reset
+    def remove_trigger(self, sprite):
+        self.stream.remove(sprite)
+
+    # Advances the game by one tick with the given keys held, returns the events from this tick
+    def step(self, inputs=NO_INPUT, delta_time=1 / 60):
+        self.events = []
+        self.apply_input(inputs)
+        self.tick_count += 1
+
+        # Bring the chunks around the player into play before it moves into them
+        with self.profiler.phase("streaming"):
+            self.stream.update(self.player_sprite.center_x)
+
+        # Move the player with the physics engine
+        with self.profiler.phase("physics"):
+            self.physics_engine.update()
+
+        # Update animations of the player and any animated tiles
+        with self.profiler.phase("animation"):
+            self.animations.update(delta_time)
+            self.playable.animations.update(delta_time)
+
+        # Making a list of all spikes and ducks the player is currently touching
+        with self.profiler.phase("collision"):
+            player_collision_list = self.triggers.hits(self.player_sprite)
+
+        # Processing each collision, ending the game if duck, removing spike otherwise
+        for collision, kind in player_collision_list:
+            self.remove_trigger(collision)
+            if kind == KIND_GOAL:
+                self.won = True
+                self.events.append((EVENT_WIN, self.score))
+                return self.events
+            self.events.append((EVENT_SPIKE, collision.position))
+            self.score -= SPIKE_PENALTY
+            self.restart()
+
+        return self.events
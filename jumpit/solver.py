@@ -0,0 +1,551 @@
+import argparse
+import heapq
+import math
+import sys
+import time
+
+from jumpit.constants import (
+    GRAVITY,
+    MAP_NAME,
+    PLAYER_JUMP_SPEED,
+    PLAYER_MOVEMENT_SPEED,
+    SIMULATION_RATE,
+    SPIKE_PENALTY,
+    START_SCORE,
+)
+from jumpit.inputs import InputState, NO_INPUT
+from jumpit.replay import ReplayRecorder, play
+
+# Node standing for the duck, every move that touches it ends there
+GOAL = "goal"
+
+# Ticks a move gets to come to rest after its keys are let go, anything longer is dropped
+SETTLE_LIMIT = SIMULATION_RATE * 4
+
+# Jumps tried from every standing spot: ticks before a direction is held, and how long it is held for.
+# Short walks fill in the spots between, so every landing spot a step apart can still be reached.
+JUMP_DELAYS = [0, 8]
+JUMP_HOLDS = list(range(2, 25, 2)) + [40]
+
+# Ticks a walk is held for, walks that take the player off a ledge keep going in the air for the rest of them
+WALK_TICKS = list(range(1, 10))
+
+# Most standing spots the solver expands before giving up on reaching the duck
+EXPAND_LIMIT = 20000
+
+# How far the physics engine moves a player that landed in a floor back up at a time, and the decimals it rounds heights to
+LANDING_STEP = 0.25
+HEIGHT_DECIMALS = 2
+
+
+# Speed the held keys move the player across at, the same way Simulation.process_keychange sets it
+def horizontal_speed(tick_input):
+    if tick_input.right and not tick_input.left:
+        return PLAYER_MOVEMENT_SPEED
+    if tick_input.left and not tick_input.right:
+        return -PLAYER_MOVEMENT_SPEED
+    return 0
+
+
+# A move from a standing spot, worked out from the physics constants alone so it is the same on every map:
+# the keys held on each tick, the speed across they give, the speed up it starts with and the ticks the keys can be let go after.
+# Moves that start the same are one arc, played once with the player let go at each of its release ticks in turn.
+class Arc:
+    def __init__(self, inputs, releases):
+        self.inputs = inputs
+        self.releases = set(releases)
+        self.speeds = [horizontal_speed(tick_input) for tick_input in inputs]
+        self.takeoff = PLAYER_JUMP_SPEED if inputs[0].up else 0
+
+    # Key runs of the move let go after the given tick and left to settle for the given ticks
+    def runs(self, held, settle):
+        runs = to_runs(self.inputs[:held])
+        if settle:
+            runs.append([NO_INPUT.to_bits(), settle])
+        return runs
+
+
+def standing_arcs():
+    arcs = []
+    for direction in (-1, 1):
+        walk = InputState(left=direction < 0, right=direction > 0)
+        arcs.append(Arc([walk] * max(WALK_TICKS), WALK_TICKS))
+
+    arcs.append(Arc([InputState(up=True)], [1]))
+    for direction in (-1, 1):
+        for delay in JUMP_DELAYS:
+            inputs = [
+                InputState(left=direction < 0 and delay <= tick, right=direction > 0 and delay <= tick, up=tick == 0)
+                for tick in range(delay + max(JUMP_HOLDS))
+            ]
+            arcs.append(Arc(inputs, [delay + hold for hold in JUMP_HOLDS]))
+    return arcs
+
+
+STANDING_ARCS = standing_arcs()
+
+
+# Standing spots are keyed by their exact position, so a route replays exactly the moves that were worked out
+def spot_key(position):
+    return f"{position[0]!r},{position[1]!r}"
+
+
+# Groups ticks of held keys into [bits, ticks] runs, the same runs replays are stored as
+def to_runs(inputs):
+    runs = []
+    for tick_input in inputs:
+        bits = tick_input.to_bits()
+        if runs and runs[-1][0] == bits:
+            runs[-1][1] += 1
+        else:
+            runs.append([bits, 1])
+    return runs
+
+
+def bounds(points):
+    xs = [x for x, y in points]
+    ys = [y for x, y in points]
+    return min(xs), max(xs), min(ys), max(ys)
+
+
+# Boxes that only touch don't overlap, the same as arcade's collision checks
+def boxes_overlap(a, b):
+    return a[0] < b[1] and b[0] < a[1] and a[2] < b[3] and b[2] < a[3]
+
+
+# The part of a hit box that fills the whole width of its box, as a box, or None when no part does.
+# Hit boxes are convex, so the vertical edges on both sides span it. Two hit boxes touch whenever these parts do.
+def solid_box(points):
+    left, right, bottom, top = bounds(points)
+    sides = []
+    for side in (left, right):
+        ys = [y for x, y in points if x == side]
+        if len(ys) < 2:
+            return None
+        sides.append((min(ys), max(ys)))
+    low = max(sides[0][0], sides[1][0])
+    high = min(sides[0][1], sides[1][1])
+    if low >= high:
+        return None
+    return left, right, low, high
+
+
+# The walls, spikes and duck of a whole level sorted into the grid columns they cover, read once from the level's sprites.
+# Arcs are swept through this instead of the physics engine. Each tick the player's box is only checked against the
+# boxes in its columns. Hit boxes are only compared where the boxes overlap and their solid parts don't, which leaves
+# little more than corners brushing past each other.
+class LevelGrid:
+    def __init__(self, sim):
+        from arcade import are_polygons_intersecting
+
+        self.polygons_intersect = are_polygons_intersecting
+        self.column_width = sim.triggers.cell_width
+
+        # Player hit box around its middle, it never changes with the player's texture
+        self.player_points = [tuple(point) for point in sim.player_sprite.get_hit_box()]
+        self.player_box = bounds(self.player_points)
+        self.player_solid = solid_box(self.player_points)
+
+        # Walls by column as (box, hit box, solid part)
+        self.walls = {}
+        for wall in sim.walls:
+            points = [tuple(point) for point in wall.get_adjusted_hit_box()]
+            self.add(self.walls, (bounds(points), points, solid_box(points)))
+
+        # Spikes and the duck by column as (box, hit box, solid part, kind, number).
+        # Spikes are numbered by their place in the map's spike layer.
+        self.triggers = {}
+        grid = sim.triggers
+        for sprite, kind in sorted(grid.kinds.items(), key=lambda item: grid.order[item[0]]):
+            points = [tuple(point) for point in sprite.get_adjusted_hit_box()]
+            self.add(self.triggers, (bounds(points), points, solid_box(points), kind, sim.stream.keys[sprite][1]))
+
+        self.moves = {}
+        self.falls = {}
+
+    def add(self, columns, entry):
+        box = entry[0]
+        for column in range(math.floor(box[0] / self.column_width), math.floor(box[1] / self.column_width) + 1):
+            columns.setdefault(column, []).append(entry)
+
+    # Entries of the columns between two x positions, an entry spanning several columns can come up more than once
+    def near(self, columns, left, right):
+        first = math.floor(left / self.column_width)
+        last = math.floor(right / self.column_width)
+        if first == last:
+            return columns.get(first, ())
+        found = []
+        for column in range(first, last + 1):
+            found += columns.get(column, ())
+        return found
+
+    def box_at(self, x, y):
+        left, right, bottom, top = self.player_box
+        return x + left, x + right, y + bottom, y + top
+
+    # Whether the player at a position, with its box already worked out, touches a wall or trigger.
+    # The same answer arcade's collision check gives.
+    def hit(self, entry, x, y, box):
+        if not boxes_overlap(box, entry[0]):
+            return False
+        solid = self.player_solid
+        if solid is not None and entry[2] is not None:
+            if boxes_overlap((x + solid[0], x + solid[1], y + solid[2], y + solid[3]), entry[2]):
+                return True
+        return self.polygons_intersect([(px + x, py + y) for px, py in self.player_points], entry[1])
+
+    # Whether the player's box overlaps any wall's box, when it doesn't the player can't be touching a wall
+    def near_wall(self, x, y):
+        box = self.box_at(x, y)
+        return any(boxes_overlap(box, entry[0]) for entry in self.near(self.walls, box[0], box[1]))
+
+    # Walls or triggers the player touches at a position
+    def touching(self, columns, x, y):
+        box = self.box_at(x, y)
+        hits = []
+        for entry in self.near(columns, box[0], box[1]):
+            if boxes_overlap(box, entry[0]) and entry not in hits and self.hit(entry, x, y, box):
+                hits.append(entry)
+        return hits
+
+    # Height the engine lifts the player to out of a wall it fell into, a quarter pixel at a time.
+    # While the player's solid part is still in the wall's they touch for sure, so those steps only add.
+    def land(self, wall, x, y):
+        solid = self.player_solid
+        if solid is not None and wall[2] is not None:
+            left, right, bottom, top = wall[2]
+            if x + solid[0] < right and left < x + solid[1] and bottom < y + solid[3]:
+                while y + solid[2] < top:
+                    y += LANDING_STEP
+        while self.hit(wall, x, y, self.box_at(x, y)):
+            y += LANDING_STEP
+        return y
+
+    # Spikes and duck the player touches at a position as (kind, number)
+    def triggers_touching(self, x, y):
+        return [(entry[3], entry[4]) for entry in self.touching(self.triggers, x, y)]
+
+    # One tick of PhysicsEnginePlatformer for a level whose walls never move.
+    # Returns (x, y, speed up), or None when the player ends up inside a wall, which the engine only guesses its way out of.
+    # A tick only depends on where the player is and how fast it is going, and arcs from spots along the same floor pass
+    # through the same ones, so each is only worked out once.
+    def move(self, x, y, change_x, change_y):
+        key = (x, y, change_x, change_y)
+        if key not in self.moves:
+            self.moves[key] = self.step(x, y, change_x, change_y)
+        return self.moves[key]
+
+    # A tick that doesn't bring the player's box near a wall is only the move itself, anything else goes through move_exact
+    def step(self, x, y, change_x, change_y):
+        next_y = y + (change_y - GRAVITY)
+        if not self.near_wall(x, next_y):
+            next_y = round(next_y, HEIGHT_DECIMALS)
+            if not change_x:
+                return x, next_y, change_y - GRAVITY
+            next_x = x + abs(change_x) * math.copysign(1, change_x)
+            if not self.near_wall(next_x, next_y):
+                return next_x, next_y, change_y - GRAVITY
+        return self.move_exact(x, y, change_x, change_y)
+
+    # The engine's own steps: gravity, the move up or down and getting back out of a floor or ceiling, then the move
+    # across with its search for how far the player gets and the step up onto anything low enough.
+    # Nothing is left out, so positions match the game to the last digit.
+    def move_exact(self, x, y, change_x, change_y):
+        original_y = y
+        change_y -= GRAVITY
+        y += change_y
+        hits = self.touching(self.walls, x, y)
+        if hits:
+            if change_y > 0:
+                while self.touching(self.walls, x, y):
+                    y -= 1
+            elif change_y < 0:
+                for wall in hits:
+                    y = self.land(wall, x, y)
+            change_y = 0.0
+        y = round(y, HEIGHT_DECIMALS)
+
+        if change_x:
+            almost_original_y = y
+            direction = math.copysign(1, change_x)
+            x_change = abs(change_x)
+            upper = x_change
+            lower = 0
+            y_change = 0
+            while True:
+                collided = self.touching(self.walls, x + x_change * direction, y)
+                if collided:
+                    # Steps up onto anything the player runs into that is no higher than it moves across
+                    y_change = x_change
+                    y = original_y + y_change
+                    collided = self.touching(self.walls, x + x_change * direction, y)
+                    if collided:
+                        y_change -= x_change
+                    else:
+                        while not collided and y_change > 0:
+                            y_change -= 1
+                            y = almost_original_y + y_change
+                            collided = self.touching(self.walls, x + x_change * direction, y)
+                        y_change += 1
+                        collided = False
+
+                    if not collided:
+                        break
+                    upper = x_change - 1
+                    if upper - lower <= 0:
+                        x_change = lower
+                        break
+                    x_change = (upper + lower) // 2
+                else:
+                    lower = x_change
+                    if upper - lower <= 0:
+                        break
+                    x_change = (upper + lower) // 2 + (upper + lower) % 2
+            x = x + x_change * direction
+            y = almost_original_y + y_change
+
+        if self.touching(self.walls, x, y):
+            return None
+        return x, y, change_y
+
+    # The player dropping straight down with nothing held, for at most limit ticks or until it lands or touches the duck.
+    # Only the walls and triggers in the player's columns can be reached, so those are picked out once and each tick
+    # just moves the player and compares heights until it comes near one of them.
+    # Returns (x, y, ticks, triggers touched as (kind, number) in order, whether it landed), or None when it ran into a wall.
+    # Like ticks, falls from the same place at the same speed are only worked out once.
+    def fall(self, x, y, change_y, limit):
+        key = (x, y, change_y, limit)
+        if key not in self.falls:
+            self.falls[key] = self.drop(x, y, change_y, limit)
+        return self.falls[key]
+
+    def drop(self, x, y, change_y, limit):
+        from jumpit.triggers import KIND_GOAL
+
+        left, right, bottom, top = self.box_at(x, 0)
+        walls = [entry[0] for entry in self.near(self.walls, left, right) if entry[0][0] < right and left < entry[0][1]]
+        triggers = [entry for entry in self.near(self.triggers, left, right) if entry[0][0] < right and left < entry[0][1]]
+        touched = []
+        for ticks in range(1, limit + 1):
+            next_y = y + (change_y - GRAVITY)
+            if any(box[2] < next_y + top and next_y + bottom < box[3] for box in walls):
+                moved = self.move_exact(x, y, 0, change_y)
+                if moved is None:
+                    return None
+                x, y, change_y = moved
+            else:
+                y = round(next_y, HEIGHT_DECIMALS)
+                change_y -= GRAVITY
+            for entry in triggers:
+                if entry[0][2] < y + top and y + bottom < entry[0][3] and (entry[3], entry[4]) not in touched:
+                    if self.hit(entry, x, y, self.box_at(x, y)):
+                        touched.append((entry[3], entry[4]))
+                        if entry[3] == KIND_GOAL:
+                            return x, y, ticks, touched, False
+            if change_y == 0:
+                return x, y, ticks, touched, True
+        return x, y, limit, touched, False
+
+
+# Plays an arc from a standing spot against the grid, letting go of the keys at each of its release ticks and waiting for the player to land.
+# Spikes are only counted, so a move through spikes says which ones it would cost instead of ending there.
+# Returns a list of (position it ended at, ticks, spikes touched, key runs), with no position if it reached the duck.
+def sweep_arc(grid, position, arc):
+    from jumpit.triggers import KIND_GOAL
+
+    x, y = position
+    change_y = arc.takeoff
+    spikes = set()
+    results = []
+    for held, change_x in enumerate(arc.speeds, 1):
+        moved = grid.move(x, y, change_x, change_y)
+        if moved is None:
+            break
+        x, y, change_y = moved
+        touched = grid.triggers_touching(x, y)
+        spikes.update(number for kind, number in touched if kind != KIND_GOAL)
+        if any(kind == KIND_GOAL for kind, number in touched):
+            results.append((None, held, sorted(spikes), arc.runs(held, 0)))
+            break
+
+        if held in arc.releases:
+            fallen = grid.fall(x, y, change_y, SETTLE_LIMIT)
+            if fallen is None:
+                continue
+            end_x, end_y, settle, touched, landed = fallen
+            fall_spikes = sorted(spikes.union(number for kind, number in touched if kind != KIND_GOAL))
+            if any(kind == KIND_GOAL for kind, number in touched):
+                results.append((None, held + settle, fall_spikes, arc.runs(held, settle)))
+            elif landed:
+                results.append(([end_x, end_y], held + settle, fall_spikes, arc.runs(held, settle)))
+
+    return results
+
+
+# Every arc from a standing spot, keeping the fastest way to each spot for each number of spikes
+def expand(grid, position):
+    best = {}
+    for arc in STANDING_ARCS:
+        for end, ticks, spikes, runs in sweep_arc(grid, position, arc):
+            if end == position:
+                continue
+            key = (GOAL if end is None else spot_key(end), len(spikes))
+            if key not in best or ticks < best[key]["ticks"]:
+                best[key] = {"to": key[0], "end": end, "ticks": ticks, "spikes": spikes, "runs": runs}
+    return list(best.values())
+
+
+# The graph of standing spots for a map, built out as far as the solver needs it.
+# Only the drop from the spawn point is played by the game's physics, every move after it is swept through the level's grid.
+class JumpGraph:
+    def __init__(self, map_name=MAP_NAME):
+        from jumpit.simulation import Simulation
+
+        self.map_name = map_name
+        self.sim = Simulation(map_name)
+        self.sim.setup()
+        self.sim.stream.load_all()
+        self.grid = LevelGrid(self.sim)
+        self.start = None
+        self.start_runs = []
+        self.goal = None
+        self.edges = {}
+        self.find_start()
+
+    # The player drops onto the floor from the spawn point before the first key does anything.
+    # A player still falling after SETTLE_LIMIT ticks never lands, the start is left as None and no route is found
+    def find_start(self):
+        from jumpit.triggers import KIND_GOAL
+
+        sim = self.sim
+        player = sim.player_sprite
+        for ticks in range(1, SETTLE_LIMIT + 1):
+            sim.step(NO_INPUT)
+            if player.change_y == 0 and sim.physics_engine.can_jump(1):
+                break
+        else:
+            sim.new_game()
+            return
+        self.start = [player.center_x, player.center_y]
+        self.start_runs = [[NO_INPUT.to_bits(), ticks]]
+        sim.new_game()
+
+        # Middle of the duck across and how close the middle of the player has to get to touch it
+        left, right = self.grid.player_box[:2]
+        for entries in self.grid.triggers.values():
+            for box, points, solid, kind, number in entries:
+                if kind == KIND_GOAL:
+                    self.goal = [(box[0] + box[1]) / 2, (box[1] - box[0]) / 2 + (right - left) / 2]
+
+    def moves_from(self, key, position):
+        edges = self.edges.get(key)
+        if edges is None:
+            edges = self.edges[key] = expand(self.grid, position)
+        return edges
+
+
+# A* from the spawn point to the duck, sweeping the arcs from a spot the first time it is reached.
+# By spikes the route touches the fewest spikes and is the fastest of those, by frames it is the fastest whatever it costs.
+# The estimate is the ticks it would take to walk straight across to the duck, which no route can beat.
+# Returns the edges taken in order, or None if the duck can't be reached or the player never lands.
+def solve(graph, by="spikes", expand_limit=EXPAND_LIMIT):
+    if graph.start is None:
+        return None
+
+    def estimate(cost, position):
+        ticks = 0
+        if position is not None and graph.goal is not None:
+            goal_x, reach = graph.goal
+            ticks = max(0, abs(position[0] - goal_x) - reach) // PLAYER_MOVEMENT_SPEED
+        return (cost[0], cost[1] + ticks) if by == "spikes" else (cost[0] + ticks, cost[1])
+
+    start = spot_key(graph.start)
+    positions = {start: graph.start}
+    costs = {start: (0, 0)}
+    previous = {}
+    queue = [(estimate((0, 0), graph.start), start)]
+    expanded = 0
+    while queue:
+        guess, key = heapq.heappop(queue)
+        cost = costs[key]
+        if guess > estimate(cost, positions[key]):
+            continue
+        if key == GOAL:
+            route = []
+            while key != start:
+                key, edge = previous[key]
+                route.append(edge)
+            return route[::-1]
+        expanded += 1
+        if expanded > expand_limit:
+            return None
+        for edge in graph.moves_from(key, positions[key]):
+            step = (len(edge["spikes"]), edge["ticks"]) if by == "spikes" else (edge["ticks"], len(edge["spikes"]))
+            new_cost = (cost[0] + step[0], cost[1] + step[1])
+            if new_cost < costs.get(edge["to"], (math.inf, math.inf)):
+                costs[edge["to"]] = new_cost
+                previous[edge["to"]] = (key, edge)
+                positions[edge["to"]] = edge["end"]
+                heapq.heappush(queue, (estimate(new_cost, edge["end"]), edge["to"]))
+    return None
+
+
+# Turns a route into a replay: the drop from the spawn point, then the keys of each move
+def route_replay(graph, route):
+    recorder = ReplayRecorder(graph.map_name, SIMULATION_RATE)
+    for runs in [graph.start_runs] + [edge["runs"] for edge in route]:
+        for bits, count in runs:
+            for _ in range(count):
+                recorder.record(InputState.from_bits(bits))
+    return recorder.replay
+
+
+# Checks a map can be beaten without losing points: python -m jumpit.solver assets/MapFinal5.JSON
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the best route through a Jump It map by searching every walk and jump.")
+    parser.add_argument("map", nargs="?", default=MAP_NAME, help="map to solve")
+    parser.add_argument("--by", choices=["spikes", "frames"], default="spikes", help="fewest spikes first, or fastest first")
+    parser.add_argument("--save-replay", default=None, help="save the route as a replay that can be played back")
+    parser.add_argument("--require-perfect", action="store_true", help="exit with an error unless a route without spikes plays back to a win")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    graph = JumpGraph(args.map)
+    loaded = time.perf_counter()
+    route = solve(graph, args.by)
+    solve_time = time.perf_counter() - loaded
+    print(f"Searched {len(graph.edges)} standing spots in {solve_time * 1000:.1f} ms, after {(loaded - start) * 1000:.1f} ms loading the level")
+    if graph.start is None:
+        print(f"The player is still falling {SETTLE_LIMIT} ticks after spawning, no route to the duck was found")
+        return 1
+    if route is None:
+        print("No route to the duck was found")
+        return 1
+
+    spikes = sum(len(edge["spikes"]) for edge in route)
+    ticks = sum(edge["ticks"] for edge in route)
+    print(f"Route: {len(route)} moves, {spikes} spikes, {ticks} ticks, best score {START_SCORE - spikes * SPIKE_PENALTY}")
+
+    # A route through spikes sends the player back to the start in the real game, so only a clean one can be played back
+    perfect = False
+    replay = route_replay(graph, route)
+    if spikes == 0:
+        result = play(replay, graph.sim)
+        perfect = bool(result.wins) and result.wins[0][1] == START_SCORE
+        print(f"Played back: {'won with ' + str(result.wins[0][1]) if result.wins else 'did not reach the duck'} after {result.ticks} ticks")
+        print(f"Perfect score possible: {'yes' if perfect else 'not confirmed'}")
+    elif args.by == "spikes":
+        print("Perfect score possible: no")
+    else:
+        print("Perfect score possible: not checked, the fastest route isn't always the cleanest, use --by spikes")
+
+    if args.save_replay:
+        replay.save(args.save_replay)
+
+    if args.require_perfect and not perfect:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import math
+import weakref
+
+import arcade
+import PIL.Image
+
+from jumpit.constants import STATIC_LAYERS
+
+# Draws the layers that never change (background and platforms) from one texture per chunk of the level in play.
+# The level stream keeps these layers' sprites in their chunks rather than the scene.
+# Each chunk's layers are drawn once into an offscreen framebuffer cleared to the window's background colour,
+# so the baked image is exactly what those layers put on the screen and every frame only draws one sprite per chunk for them.
+# Only the static layers at the bottom of the draw order are baked, so the layers drawn over them still overlap the same way.
+# Each bake is drawn from a sprite list with an atlas of its own, so letting go of a chunk frees its texture along with it.
+# Chunks built ahead of the player are baked a frame at a time before they come into play, and keep their bake after
+# they leave it, so walking back and forth over a chunk boundary never bakes during a frame.
+# The bakes of a level are kept for as long as the level is, so switching back to a level kept built draws it straight away.
+class StaticLayers:
+    def __init__(self, names=STATIC_LAYERS):
+        self.names = names
+        self.level = None
+        self.dynamic_names = []
+        self.baked_names = []
+
+        # Sprite list holding the bake of each chunk in play, by chunk number
+        self.baked = {}
+
+        # Bakes and layer split of every level drawn that is still around, by level
+        self.levels = weakref.WeakKeyDictionary()
+
+    # Static layers at the bottom of the draw order and the layers left to draw as sprites
+    def split(self, scene):
+        names = {id(sprite_list): name for name, sprite_list in scene.name_mapping.items()}
+        ordered = [names[id(sprite_list)] for sprite_list in scene.sprite_lists]
+        baked = 0
+        while baked < len(ordered) and ordered[baked] in self.names:
+            baked += 1
+        return ordered[:baked], ordered[baked:]
+
+    # Switches to drawing a different level, picking up its bakes from when it was last drawn
+    def start(self, level):
+        self.level = level
+        if level not in self.levels:
+            self.levels[level] = ({}, *self.split(level.scene))
+        self.baked, self.baked_names, self.dynamic_names = self.levels[level]
+
+    # Bakes the static layers of one chunk, anything poking out past the sides of the chunk is cut off
+    def bake(self, stream, chunk, background_color):
+        level = self.level
+        layers = [[sprite for index, sprite in chunk.layers.get(name, [])] for name in self.baked_names if level.scene[name].visible]
+        sprites = [sprite for layer in layers for sprite in layer]
+        if not sprites:
+            return None
+
+        left = math.floor(max(min(sprite.left for sprite in sprites), stream.left + chunk.number * stream.source.chunk_width))
+        right = math.ceil(min(max(sprite.right for sprite in sprites), stream.left + (chunk.number + 1) * stream.source.chunk_width))
+        bottom = math.floor(min(sprite.bottom for sprite in sprites))
+        top = math.ceil(max(sprite.top for sprite in sprites))
+        width = right - left
+        height = top - bottom
+
+        ctx = arcade.get_window().ctx
+        framebuffer = ctx.framebuffer(color_attachments=[ctx.texture((width, height), components=4)])
+        projection = ctx.projection_2d_matrix
+        with framebuffer.activate():
+            framebuffer.clear(background_color)
+            ctx.projection_2d = (left, right, bottom, top)
+            for layer in layers:
+                sprite_list = arcade.SpriteList()
+                sprite_list.extend(layer)
+                sprite_list.draw()
+                sprite_list.clear()
+        ctx.projection_2d_matrix = projection
+
+        # Framebuffer rows start at the bottom, images start at the top
+        image = PIL.Image.frombytes("RGBA", (width, height), bytes(framebuffer.read(components=4)))
+        image = image.transpose(PIL.Image.FLIP_TOP_BOTTOM)
+        texture = arcade.Texture(f"static-layers-{level.map_name}-{id(level)}-{chunk.number}", image, hit_box_algorithm="None")
+        sprite = arcade.Sprite(texture=texture)
+        sprite.position = (left + width / 2, bottom + height / 2)
+        baked = arcade.SpriteList(atlas=arcade.TextureAtlas((width + 2, height + 2)))
+        baked.append(sprite)
+        return baked
+
+    # Chunks built around the ones in play that the player can reach next, by chunk number
+    def ahead(self, stream):
+        chunks = dict(stream.built)
+        for number, future in stream.pending.items():
+            if future.done() and not future.cancelled() and future.exception() is None:
+                chunks[number] = future.result()
+        return chunks
+
+    # Bakes the chunks in play that aren't baked yet, and one chunk built ahead of the player a frame so it is baked
+    # before it comes into play. A bake is kept for as long as its chunk is built, only chunks let go altogether lose theirs
+    def refresh(self, stream, background_color):
+        kept = stream.loaded.keys() | stream.built.keys() | stream.pending.keys()
+        for number in [number for number in self.baked if number not in kept]:
+            del self.baked[number]
+        for number, chunk in sorted(stream.loaded.items()):
+            if number not in self.baked:
+                self.baked[number] = self.bake(stream, chunk, background_color)
+        for number, chunk in sorted(self.ahead(stream).items()):
+            if number not in self.baked:
+                self.baked[number] = self.bake(stream, chunk, background_color)
+                break
+
+    # Draws the level in play, baking the chunks that came into play since the last frame first
+    def draw(self, stream, background_color):
+        if stream.level is not self.level:
+            self.start(stream.level)
+        self.refresh(stream, background_color)
+        for number in stream.loaded:
+            baked = self.baked.get(number)
+            if baked is not None:
+                baked.draw()
+        if self.dynamic_names:
+            stream.level.scene.draw(self.dynamic_names)
@@ -0,0 +1,283 @@
+import math
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import arcade
+
+from jumpit.collision import collider_sprites
+from jumpit.constants import CHUNK_COLUMNS, MAP_OFFSET, STATIC_LAYERS, STREAM_RADIUS, TILE_SCALING
+from jumpit.level_cache import Level, UnsupportedLevel, build_sprites, empty_scene, load_level, options_for, read_cache, write_cache
+from jumpit.triggers import TriggerGrid
+
+
+# Takes a sprite out of every list it is in, without anything in those lists still holding on to it.
+# arcade keeps the sprites added to a list before it has a window in a set until the list is first drawn, and a spatial hash
+# keeps the buckets of every sprite it ever had. Neither forgets a removed sprite, so without this each chunk let go would stay in memory.
+def drop_sprite(sprite):
+    sprite_lists = list(sprite.sprite_lists)
+    sprite.remove_from_sprite_lists()
+    for sprite_list in sprite_lists:
+        deferred = getattr(sprite_list, "_deferred_sprites", None)
+        if deferred:
+            deferred.discard(sprite)
+        if sprite_list.spatial_hash is not None:
+            sprite_list.spatial_hash.buckets_for_sprite.pop(sprite, None)
+
+
+# Throws away the empty buckets a spatial hash leaves behind where removed sprites were
+def prune_spatial_hash(sprite_list):
+    spatial_hash = sprite_list.spatial_hash
+    if spatial_hash is not None:
+        spatial_hash.contents = {cell: bucket for cell, bucket in spatial_hash.contents.items() if bucket}
+
+
+# Sorts a level into chunks CHUNK_COLUMNS tiles wide by where each sprite's middle is, counted from the left of the map
+class ChunkSource:
+    def __init__(self, chunk_width, left):
+        self.chunk_width = chunk_width
+        self.left = left
+
+        # What each chunk holds for each layer, by chunk number
+        self.chunks = {}
+
+    def chunk_at(self, x):
+        return math.floor((x - self.left) / self.chunk_width)
+
+
+# Creates the sprites of a chunk from a level's compiled cache, sprites of chunks that aren't needed are never created
+class CacheSource(ChunkSource):
+    def __init__(self, map_name, meta, layer_options, scaling, chunk_width, left):
+        super().__init__(chunk_width, left)
+        self.map_name = map_name
+        self.meta = meta
+        self.scaling = scaling
+        self.options = {layer["name"]: options_for(layer["name"], layer_options) for layer in meta["layers"]}
+
+        # Textures are shared by every chunk, so a tile's texture is made once however often its chunk is loaded
+        self.textures = {}
+
+        # Indices of the sprites in the cached arrays, sorted into chunks once from their positions
+        for layer in meta["layers"]:
+            for index, x in enumerate(layer["x"]):
+                layers = self.chunks.setdefault(self.chunk_at(x), {})
+                layers.setdefault(layer["name"], array("I")).append(index)
+
+    # Sprites of each layer in a chunk as (index in the layer, sprite), only for the given layers if there are any
+    def build(self, number, names=None):
+        layers = {}
+        for layer in self.meta["layers"]:
+            indices = self.chunks.get(number, {}).get(layer["name"])
+            if indices is None or (names is not None and layer["name"] not in names):
+                continue
+            sprites = build_sprites(self.map_name, self.meta, layer, self.options[layer["name"]], self.textures, indices, self.scaling)
+            layers[layer["name"]] = list(zip(indices, sprites))
+        return layers
+
+
+# Splits up the sprites of a level that was loaded straight from its map.
+# Maps the cache can't store are loaded whole, so this keeps the distant chunks out of play but not out of memory.
+class SceneSource(ChunkSource):
+    def __init__(self, scene, chunk_width, left):
+        super().__init__(chunk_width, left)
+        for name, sprite_list in scene.name_mapping.items():
+            for index, sprite in enumerate(list(sprite_list)):
+                layers = self.chunks.setdefault(self.chunk_at(sprite.center_x), {})
+                layers.setdefault(name, []).append((index, sprite))
+                drop_sprite(sprite)
+
+    def build(self, number, names=None):
+        return {name: list(entries) for name, entries in self.chunks.get(number, {}).items() if names is None or name in names}
+
+
+# The sprites of one chunk and the walls worked out from its platforms
+class Chunk:
+    def __init__(self, number, layers, colliders):
+        self.number = number
+        self.layers = layers
+        self.colliders = colliders
+
+
+# Reads a level's cache, compiling it first when it is missing or stale.
+# Nothing here needs a window, so a level can be read on another thread while the window opens.
+# Returns None for maps the cache can't store, open_level loads those whole.
+def read_level(map_name, scaling=TILE_SCALING, offset=MAP_OFFSET):
+    meta = read_cache(map_name, scaling, offset)
+    if meta is None:
+        try:
+            write_cache(map_name, scaling, offset)
+        except (UnsupportedLevel, OSError):
+            return None
+        meta = read_cache(map_name, scaling, offset)
+    return meta
+
+
+# Opens a level to be streamed, returns the level with empty layers and the source its chunks are built from.
+# A cache already read with read_level can be handed over as meta. A level opened from its cache doesn't touch the GPU
+# until it is drawn, so it can be opened on another thread while a different level is played.
+def open_level(map_name, layer_options=None, scaling=TILE_SCALING, offset=MAP_OFFSET, meta=None):
+    if meta is None:
+        meta = read_cache(map_name, scaling, offset)
+    if meta is not None:
+        level = Level(map_name, empty_scene(meta, layer_options, lazy=True), meta["width"], meta["height"], meta["tile_width"], meta["tile_height"])
+        return level, CacheSource(map_name, meta, layer_options, scaling, CHUNK_COLUMNS * meta["tile_width"] * scaling, offset[0])
+
+    level = load_level(map_name, layer_options, scaling, offset)
+    return level, SceneSource(level.scene, CHUNK_COLUMNS * level.tile_width * scaling, offset[0])
+
+
+# Keeps the chunks around the player in play and the rest of the level out of it.
+# A chunk in play has its sprites in the scene, its spikes and duck in the trigger grid and its walls in the physics engine,
+# so drawing, physics and trigger checks only ever see a few screens of the level however wide it is.
+# The chunks just past those are built on a background thread before the player gets to them, anything further is let go.
+# Triggers that were set off stay gone when their chunk comes back, until the level is reset.
+# Sprites of the static layers stay in their chunk instead of the scene, they are only ever drawn baked (see StaticLayers)
+# and taking hundreds of tiles back out of a sprite list one at a time would stall a frame every time a chunk is let go.
+class LevelStream:
+    def __init__(self, level, source, animations, trigger_layers, wall_layer, scaling=TILE_SCALING, radius=STREAM_RADIUS, static_names=STATIC_LAYERS):
+        self.level = level
+        self.source = source
+        self.animations = animations
+        self.trigger_layers = trigger_layers
+        self.wall_layer = wall_layer
+        self.radius = radius
+        self.static_names = static_names
+        self.tile_width = level.tile_width * scaling
+        self.tile_height = level.tile_height * scaling
+
+        # Left and right edges of the whole level
+        self.left = source.left
+        self.right = source.left + level.width * self.tile_width
+
+        # Walls and triggers of the chunks in play, the physics engine and the rules use these directly.
+        # The walls are never drawn, so their sprite list never needs GPU buffers
+        self.walls = arcade.SpriteList(use_spatial_hash=True, lazy=True)
+        self.triggers = TriggerGrid(self.tile_width, self.tile_height)
+
+        # Chunks in play, chunks built and waiting, and chunks being built, by chunk number
+        self.loaded = {}
+        self.built = {}
+        self.pending = {}
+
+        # Chunks kept in play wherever the player is, the ones around the spawn point so respawning never waits
+        self.pinned = set()
+
+        # Chunk the player was in at the last update
+        self.center = None
+
+        # Triggers in play as (layer, index in the layer), and the ones that have been set off
+        self.keys = {}
+        self.removed = set()
+
+        # Chunks are built ahead of time on this thread, only the main thread adds their sprites to sprite lists
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="level-stream")
+
+    def chunk_at(self, x):
+        return self.source.chunk_at(x)
+
+    # Chunks of the level within a number of chunks of the given one
+    def nearby(self, number, radius):
+        return {other for other in range(number - radius, number + radius + 1) if other in self.source.chunks}
+
+    def pin(self, x):
+        self.pinned = self.nearby(self.chunk_at(x), self.radius)
+
+    def build_chunk(self, number):
+        layers = self.source.build(number)
+        walls = [sprite for index, sprite in layers.get(self.wall_layer, [])]
+        return Chunk(number, layers, collider_sprites(walls, self.tile_width, self.tile_height))
+
+    # A chunk ready to be put in play, only built here if it wasn't built ahead of time
+    def take(self, number):
+        if number in self.built:
+            return self.built.pop(number)
+        if number in self.pending:
+            return self.pending.pop(number).result()
+        return self.build_chunk(number)
+
+    # Brings the chunks around x into play and lets go of the ones too far away, does nothing until the player changes chunk
+    def update(self, x):
+        center = self.chunk_at(x)
+        if center == self.center:
+            return
+        self.center = center
+        wanted = self.nearby(center, self.radius) | self.pinned
+        ahead = self.nearby(center, self.radius + 1) | self.pinned
+
+        for number in sorted(self.loaded.keys() - wanted):
+            self.detach(number)
+        for number in list(self.built):
+            if number not in ahead:
+                del self.built[number]
+        for number in list(self.pending):
+            if number not in ahead:
+                self.pending.pop(number).cancel()
+
+        for number in sorted(wanted - self.loaded.keys()):
+            self.attach(self.take(number))
+        for number in sorted(ahead - self.loaded.keys() - self.built.keys() - self.pending.keys()):
+            self.pending[number] = self.executor.submit(self.build_chunk, number)
+
+    def attach(self, chunk):
+        scene = self.level.scene
+        for name, entries in chunk.layers.items():
+            if name in self.static_names:
+                continue
+            sprite_list = scene[name]
+            kind = self.trigger_layers.get(name)
+            for index, sprite in entries:
+                if kind is not None:
+                    if (name, index) in self.removed:
+                        continue
+                    self.keys[sprite] = (name, index)
+                    self.triggers.add(sprite, kind)
+                sprite_list.append(sprite)
+                self.animations.register(sprite)
+        self.walls.extend(chunk.colliders)
+        self.loaded[chunk.number] = chunk
+
+    # Takes a chunk out of play, it is kept built while the player is close enough to come back to it
+    def detach(self, number):
+        chunk = self.loaded.pop(number)
+        for name, entries in chunk.layers.items():
+            if name in self.static_names:
+                continue
+            for index, sprite in entries:
+                self.triggers.discard(sprite)
+                self.keys.pop(sprite, None)
+                self.animations.unregister(sprite)
+                drop_sprite(sprite)
+        for collider in chunk.colliders:
+            drop_sprite(collider)
+        prune_spatial_hash(self.walls)
+        for sprite_list in self.level.scene.sprite_lists:
+            prune_spatial_hash(sprite_list)
+        self.built[number] = chunk
+
+    # Brings every chunk of the level into play for good, for a level shared by players anywhere in it
+    def load_all(self):
+        self.pinned = set(self.source.chunks)
+        self.center = None
+        self.update(self.left)
+
+    # Takes a trigger that was set off out of play for the rest of the game
+    def remove(self, sprite):
+        key = self.keys.pop(sprite, None)
+        if key is not None:
+            self.removed.add(key)
+        self.triggers.remove(sprite)
+        drop_sprite(sprite)
+
+    # Puts every trigger that was set off back, the ones in chunks out of play come back with their chunk
+    def reset(self):
+        self.removed.clear()
+        scene = self.level.scene
+        for chunk in self.loaded.values():
+            for name, kind in self.trigger_layers.items():
+                for index, sprite in chunk.layers.get(name, []):
+                    if not sprite.sprite_lists:
+                        scene[name].append(sprite)
+                    self.keys[sprite] = (name, index)
+                    self.triggers.add(sprite, kind)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
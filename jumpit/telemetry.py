@@ -0,0 +1,190 @@
+import os
+import queue
+import struct
+import threading
+from array import array
+
+from jumpit.constants import MAP_NAME, TELEMETRY_CAPACITY
+from jumpit.replay import claim_session_path
+
+# Telemetry files are a short header followed by blocks of events.
+# Each block is its number of events followed by one column at a time, so a reader can take a whole column
+# of a block in one go instead of picking events apart one by one.
+TELEMETRY_EXTENSION = ".jtl"
+TELEMETRY_MAGIC = b"JITT"
+TELEMETRY_VERSION = 1
+
+# Magic, version and length of the map name that follows
+HEADER = struct.Struct("<4sBH")
+
+# Number of events in the block
+BLOCK = struct.Struct("<I")
+
+# Columns of a block in the order they are written, as (name, array type code)
+COLUMNS = (("run", "I"), ("tick", "I"), ("kind", "B"), ("x", "f"), ("y", "f"))
+
+# What happened, positions are the spike that was hit, or the player for the others
+KIND_SPIKE = 1
+KIND_WIN = 2
+KIND_RESET = 3
+KIND_INSTRUCTIONS = 4
+KIND_NAMES = {KIND_SPIKE: "spike", KIND_WIN: "win", KIND_RESET: "reset", KIND_INSTRUCTIONS: "instructions"}
+
+# Position of events that don't have one
+NO_POSITION = float("nan")
+
+
+# Events waiting to be written, every column is allocated up front at its full size and filled in place
+class EventBuffer:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.count = 0
+        self.columns = {name: array(code, bytes(capacity * array(code).itemsize)) for name, code in COLUMNS}
+        self.runs = self.columns["run"]
+        self.ticks = self.columns["tick"]
+        self.kinds = self.columns["kind"]
+        self.xs = self.columns["x"]
+        self.ys = self.columns["y"]
+
+    # Adds an event, returns True once the buffer is full
+    def append(self, kind, run, tick, x, y):
+        index = self.count
+        self.runs[index] = run
+        self.ticks[index] = tick
+        self.kinds[index] = kind
+        self.xs[index] = x
+        self.ys[index] = y
+        self.count = index + 1
+        return self.count == self.capacity
+
+    def to_bytes(self):
+        count = self.count
+        return BLOCK.pack(count) + b"".join(memoryview(self.columns[name])[:count].tobytes() for name, code in COLUMNS)
+
+
+# Records what happens in each run of a session and writes it out in blocks on a thread of its own.
+# Events go into one of two preallocated buffers, when it fills up it is handed to the thread and the other one is used,
+# so recording an event is a few stores into arrays and never touches the disk or allocates.
+# Events are added to the end of a file recorded on the same map, the header is written with the first block of a new one.
+class TelemetryWriter:
+    def __init__(self, path, map_name=MAP_NAME, capacity=TELEMETRY_CAPACITY):
+        if os.path.exists(path) and os.path.getsize(path) and read_map_name(path) != map_name:
+            raise ValueError(f"{path} holds telemetry of another map")
+        self.path = path
+        self.map_name = map_name
+        self.buffer = EventBuffer(capacity)
+        self.free = queue.SimpleQueue()
+        self.free.put(EventBuffer(capacity))
+        self.requests = queue.SimpleQueue()
+
+        # Set by the thread when the file can't be written, events recorded after that are dropped
+        self.failed = False
+
+        self.thread = threading.Thread(target=self.run, name="TelemetryWriter", daemon=True)
+        self.thread.start()
+
+    def record(self, kind, run, tick, x=NO_POSITION, y=NO_POSITION):
+        if self.buffer.append(kind, run, tick, x, y):
+            self.flush()
+
+    # Hands the events recorded so far to the thread, or drops them once the thread has given up
+    def flush(self):
+        if not self.buffer.count:
+            return
+        if self.failed:
+            self.buffer.count = 0
+            return
+        self.requests.put(self.buffer)
+        try:
+            self.buffer = self.free.get_nowait()
+        except queue.Empty:
+            # The thread is behind, rather than wait for it another buffer is made
+            self.buffer = EventBuffer(self.buffer.capacity)
+
+    # Writes anything still recorded and stops the thread
+    def close(self, timeout=None):
+        self.flush()
+        self.requests.put(None)
+        self.thread.join(timeout)
+
+    def run(self):
+        fout = None
+        try:
+            while True:
+                buffer = self.requests.get()
+                if buffer is None:
+                    break
+                if fout is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    fout = open(self.path, "ab")
+                    if fout.tell() == 0:
+                        name = self.map_name.encode()
+                        fout.write(HEADER.pack(TELEMETRY_MAGIC, TELEMETRY_VERSION, len(name)) + name)
+                fout.write(buffer.to_bytes())
+                fout.flush()
+                buffer.count = 0
+                self.free.put(buffer)
+        except OSError:
+            # Telemetry is only for looking at later, the game goes on without it
+            self.failed = True
+        finally:
+            if fout is not None:
+                fout.close()
+            elif os.path.exists(self.path) and not os.path.getsize(self.path):
+                # Nothing was recorded, a file without even a header isn't left behind
+                os.remove(self.path)
+
+
+# Telemetry that records nothing, for when it is turned off
+class NullTelemetry:
+    def record(self, kind, run, tick, x=NO_POSITION, y=NO_POSITION):
+        pass
+
+    def close(self, timeout=None):
+        pass
+
+
+NULL_TELEMETRY = NullTelemetry()
+
+
+# Map name in the header at the start of a telemetry file's data, and where the blocks after it start
+def read_header(data):
+    if len(data) < HEADER.size:
+        raise ValueError("Not a Jump It telemetry file")
+    magic, version, name_length = HEADER.unpack_from(data)
+    if magic != TELEMETRY_MAGIC or version != TELEMETRY_VERSION:
+        raise ValueError("Not a Jump It telemetry file")
+    position = HEADER.size
+    return data[position:position + name_length].decode(), position + name_length
+
+
+def read_map_name(path):
+    with open(path, "rb") as fin:
+        return read_header(fin.read(HEADER.size + 0xFFFF))[0]
+
+
+# Reads a telemetry file as its map name and a list of blocks, each block being {column name: bytes}
+def read_blocks(path):
+    with open(path, "rb") as fin:
+        data = fin.read()
+    map_name, position = read_header(data)
+
+    blocks = []
+    while position + BLOCK.size <= len(data):
+        (count,) = BLOCK.unpack_from(data, position)
+        position += BLOCK.size
+        block = {}
+        for name, code in COLUMNS:
+            size = count * array(code).itemsize
+            block[name] = data[position:position + size]
+            position += size
+        if position > len(data):
+            # A block cut off by a crash is dropped
+            break
+        blocks.append(block)
+    return map_name, blocks
+
+
+# Where the window saves each session's telemetry when it is on, a file of its own for each level played
+def new_telemetry_path(folder, map_name=MAP_NAME):
+    return claim_session_path(folder, map_name, TELEMETRY_EXTENSION)
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import threading
+
+import arcade
+import PIL.Image
+from arcade.hitbox import calculate_hit_box_points_simple
+
+from jumpit.scores import atomic_write
+
+# Hit boxes worked out for entity images, kept next to the images so a new run doesn't scan them again
+HIT_BOX_FILE = "assets/hit_boxes.json"
+HIT_BOX_VERSION = 1
+
+
+# SHA-1 of an image file, a cached hit box is only used while the image is unchanged
+def file_hash(path):
+    with open(path, "rb") as fin:
+        return hashlib.sha1(fin.read()).hexdigest()
+
+
+# Textures shared by every entity in the process, keyed by image path and whether it is flipped.
+# Each image is decoded once and its hit box comes from the file on disk when it has one,
+# so creating another entity only looks textures up.
+# Images can be loaded ahead of time on another thread, a lookup for an image still loading waits for it.
+class TextureRegistry:
+    def __init__(self, hit_box_path=HIT_BOX_FILE):
+        self.hit_box_path = hit_box_path
+        self.textures = {}
+        self.hit_boxes = None
+        self.dirty = False
+        self.lock = threading.RLock()
+
+    def load_hit_boxes(self):
+        self.hit_boxes = {}
+        try:
+            with open(self.hit_box_path) as fin:
+                data = json.load(fin)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == HIT_BOX_VERSION:
+            self.hit_boxes = data["images"]
+
+    def save_hit_boxes(self):
+        if not self.dirty:
+            return
+        try:
+            atomic_write(self.hit_box_path, json.dumps({"version": HIT_BOX_VERSION, "images": self.hit_boxes}))
+            self.dirty = False
+        except OSError:
+            # Not being able to save only means the hit boxes are worked out again next run
+            pass
+
+    # Cached [right-facing, left-facing] hit boxes for an image, or works them out and stores them
+    def image_hit_boxes(self, path, images):
+        if self.hit_boxes is None:
+            self.load_hit_boxes()
+        digest = file_hash(path)
+        entry = self.hit_boxes.get(path)
+        if entry is None or entry["hash"] != digest:
+            entry = {"hash": digest, "points": [calculate_hit_box_points_simple(image) for image in images]}
+            self.hit_boxes[path] = entry
+            self.dirty = True
+        return [tuple(tuple(point) for point in points) for points in entry["points"]]
+
+    # Loads an image and its flipped copy as textures, the same ones arcade.load_texture would give
+    def load(self, path):
+        image = PIL.Image.open(path).convert("RGBA")
+        images = [image, image.transpose(PIL.Image.FLIP_LEFT_RIGHT)]
+        hit_boxes = self.image_hit_boxes(path, images)
+        self.save_hit_boxes()
+        for flipped, (flipped_image, points) in enumerate(zip(images, hit_boxes)):
+            texture = arcade.Texture(f"{path}-flipped" if flipped else path, flipped_image)
+            # Handing the points over here means the texture never scans its image
+            texture._hit_box_points = points
+            self.textures[(path, bool(flipped))] = texture
+
+    def get(self, path, flipped=False):
+        key = (path, flipped)
+        with self.lock:
+            if key not in self.textures:
+                self.load(path)
+            return self.textures[key]
+
+    # Right-facing and left-facing textures for an image
+    def pair(self, path):
+        return [self.get(path), self.get(path, True)]
+
+    # Loads images ahead of time so the entities using them don't wait on the disk
+    def preload(self, paths):
+        for path in paths:
+            self.get(path)
+
+
+# Registry used by the game's entities
+TEXTURES = TextureRegistry()
@@ -0,0 +1,30 @@
+from jumpit.constants import SIMULATION_RATE, MAX_CATCH_UP_STEPS
+
+
+# Turns the time between frames into a whole number of fixed simulation ticks.
+# Leftover time is carried to the next frame, and alpha says how far the game is between the last tick and the next.
+class FixedTimestep:
+    def __init__(self, rate=SIMULATION_RATE, max_steps=MAX_CATCH_UP_STEPS):
+        self.step_time = 1 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+
+    # Adds a frame's time, returns how many ticks to run for it
+    def advance(self, delta_time):
+        self.accumulator += delta_time
+        steps = int(self.accumulator / self.step_time)
+        if steps > self.max_steps:
+            # Too far behind to catch up, run the most allowed and drop the rest so the game doesn't spiral
+            steps = self.max_steps
+            self.accumulator = self.step_time * self.max_steps
+        self.accumulator -= steps * self.step_time
+        return steps
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.step_time
+
+
+# Linear interpolation between two points
+def lerp_point(start, end, alpha):
+    return (start[0] + (end[0] - start[0]) * alpha, start[1] + (end[1] - start[1]) * alpha)
@@ -0,0 +1,94 @@
+import math
+
+import arcade
+
+# What happens when the player touches a trigger
+KIND_HAZARD = "hazard"
+KIND_GOAL = "goal"
+
+# Hazards are handled before goals when both are touched on the same tick, same as checking the spike layer first
+KIND_ORDER = {KIND_HAZARD: 0, KIND_GOAL: 1}
+
+
+# Grid cells a box covers, edges included, so two boxes that touch always share a cell
+def covered_cells(points, cell_width, cell_height):
+    xs = [x for x, y in points]
+    ys = [y for x, y in points]
+    first_column = math.floor(min(xs) / cell_width)
+    last_column = math.floor(max(xs) / cell_width)
+    first_row = math.floor(min(ys) / cell_height)
+    last_row = math.floor(max(ys) / cell_height)
+    return tuple(
+        (column, row)
+        for column in range(first_column, last_column + 1)
+        for row in range(first_row, last_row + 1)
+    )
+
+
+# Spikes, the duck and anything else the player sets off by touching, indexed by the grid cells they cover.
+# The sprites that could be touched are only looked up again when the player moves into other cells
+# or a trigger is added or removed, and only those few are checked against the player's hit box.
+class TriggerGrid:
+    def __init__(self, cell_width, cell_height):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+
+        # Sprites in each cell, the kind of each sprite and the cells each sprite covers
+        self.cells = {}
+        self.kinds = {}
+        self.sprite_cells = {}
+
+        # Order sprites were added in, so hits come back in the same order every run
+        self.order = {}
+
+        # Player cells and candidates from the last lookup, thrown away whenever the triggers change
+        self.last_cells = None
+        self.candidates = []
+
+    def add(self, sprite, kind):
+        if sprite in self.kinds:
+            return
+        cells = covered_cells(sprite.get_adjusted_hit_box(), self.cell_width, self.cell_height)
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(sprite)
+        self.kinds[sprite] = kind
+        self.sprite_cells[sprite] = cells
+        self.order.setdefault(sprite, len(self.order))
+        self.last_cells = None
+
+    def remove(self, sprite):
+        cells = self.sprite_cells.pop(sprite, None)
+        if cells is None:
+            return
+        for cell in cells:
+            self.cells[cell].discard(sprite)
+            if not self.cells[cell]:
+                del self.cells[cell]
+        del self.kinds[sprite]
+        self.last_cells = None
+
+    # Removes a trigger for good, if it is ever added again it goes after the ones already added
+    def discard(self, sprite):
+        self.remove(sprite)
+        self.order.pop(sprite, None)
+
+    def __contains__(self, sprite):
+        return sprite in self.kinds
+
+    def __len__(self):
+        return len(self.kinds)
+
+    # Triggers in the cells the player covers, hazards first
+    def lookup(self, player):
+        player_cells = covered_cells(player.get_adjusted_hit_box(), self.cell_width, self.cell_height)
+        if player_cells != self.last_cells:
+            self.last_cells = player_cells
+            found = set()
+            for cell in player_cells:
+                found.update(self.cells.get(cell, ()))
+            self.candidates = sorted(found, key=lambda sprite: (KIND_ORDER[self.kinds[sprite]], self.order[sprite]))
+        return self.candidates
+
+    # Triggers the player is touching this tick as (sprite, kind)
+    def hits(self, player):
+        return [(sprite, self.kinds[sprite]) for sprite in self.lookup(player) if arcade.check_for_collision(player, sprite)]